@@ -0,0 +1,67 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTTLCache:
+    """Асинхронный кэш с TTL и объединением одновременных запросов.
+
+    Пока один запрос к источнику по ключу в работе, остальные ждут его же
+    результат. Устаревшее значение (не старше ttl + stale_ttl) отдается
+    сразу, а обновление запускается в фоне. loader возвращает None при
+    ошибке - такой результат не кэшируется.
+    """
+
+    def __init__(self, loader, ttl, stale_ttl=0):
+        self._loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = {}
+        self._inflight = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._refresh(key)
+                return value
+
+        self.misses += 1
+        # shield: отмена одного ожидающего не должна отменять общий запрос
+        return await asyncio.shield(self._refresh(key))
+
+    def _refresh(self, key):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key))
+            self._inflight[key] = task
+        return task
+
+    async def _load(self, key):
+        try:
+            value = await self._loader(key)
+            if value is not None:
+                self._entries[key] = (value, time.monotonic())
+            return value
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении кэша ({key}): {str(e)}")
+            return None
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, key=None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
@@ -1,17 +1,33 @@
 import os
+import sys
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher, types
+import tempfile
+import time
+from aiogram import Bot, Dispatcher, F, types
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
-from aiogram.utils.keyboard import ReplyKeyboardBuilder
+from aiogram.types import CallbackQuery, FSInputFile, Message, ReplyKeyboardMarkup, KeyboardButton
+from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 import asyncpg
 from datetime import datetime, timedelta
+from contextlib import asynccontextmanager, contextmanager
+from decimal import Decimal
 import aiohttp
 from dotenv import load_dotenv
+from async_cache import AsyncTTLCache
+from write_behind import INSERT_OPERATION, OperationWriter
+from csv_import import ImportErrors, import_operations, iter_operations, open_csv
+from csv_export import export_operations
+
+from common.fsm_storage import create_fsm_storage
+from common.migrations import apply_migrations_async
+from common.webhook import run_bot
+from common.metrics import (
+    DB_QUERY_SECONDS, UPSTREAM_REQUEST_SECONDS, CallbackMetric, setup_bot_metrics
+)
+from common.tracing import configure_tracing, inject_headers, setup_bot_tracing, start_span
 
 # Загрузка переменных окружения
 load_dotenv()
@@ -38,10 +54,47 @@ DB_CONFIG = {
 }
 CURRENCY_SERVICE_URL = os.getenv('CURRENCY_SERVICE_URL')
 
+# Настройки HTTP-клиента и кэша курсов
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 3))
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', 20))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', 30))
+RATE_CACHE_TTL = float(os.getenv('RATE_CACHE_TTL', 60))
+# Сколько еще секунд после TTL можно отдавать старый курс, обновляя его в фоне
+RATE_CACHE_STALE_TTL = float(os.getenv('RATE_CACHE_STALE_TTL', 600))
+
+# Настройки пула соединений с БД
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv('DB_POOL_ACQUIRE_TIMEOUT', 5))
+DB_POOL_MAX_INACTIVE_LIFETIME = float(os.getenv('DB_POOL_MAX_INACTIVE_LIFETIME', 300))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 100))
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Пакетная запись операций (write-behind): вставки копятся до
+# WRITE_BEHIND_BATCH_SIZE штук или WRITE_BEHIND_FLUSH_INTERVAL секунд
+WRITE_BEHIND_ENABLED = os.getenv('WRITE_BEHIND_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 100))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv('WRITE_BEHIND_FLUSH_INTERVAL', 0.05))
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv('WRITE_BEHIND_QUEUE_SIZE', 10000))
+
+# Импорт операций из CSV: размер части для COPY и предел размера файла
+# (Bot API отдает ботам файлы не больше 20 МБ)
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 5000))
+IMPORT_MAX_FILE_SIZE = 20 * 1024 * 1024
+# Сколько строк серверный курсор экспорта читает за один запрос
+EXPORT_PREFETCH = int(os.getenv('EXPORT_PREFETCH', 1000))
+
+# Сколько операций показывать на одной странице отчета
+REPORT_PAGE_SIZE = int(os.getenv('REPORT_PAGE_SIZE', 20))
+
 # Инициализация бота
 bot = Bot(token=BOT_TOKEN)
-storage = MemoryStorage()
+storage = create_fsm_storage(DB_CONFIG)
 dp = Dispatcher(storage=storage)
+setup_bot_metrics(dp)
+setup_bot_tracing(dp)
+configure_tracing('finance_bot')
 
 
 # Состояния FSM
@@ -55,52 +108,259 @@ class AddOperationState(StatesGroup):
     waiting_for_date = State()
 
 
+class ImportState(StatesGroup):
+    waiting_for_file = State()
+
+
 class ReportState(StatesGroup):
     waiting_for_currency = State()
     waiting_for_period = State()
 
 
 # Подключение к БД
-async def create_db_connection():
+# Общий пул соединений создается один раз при запуске в init_db()
+db_pool = None
+
+
+@asynccontextmanager
+async def acquire_db_connection():
+    """Получение соединения из общего пула (используется как async with)"""
+    with start_span('db acquire'):
+        conn = await db_pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT)
+    try:
+        yield conn
+    finally:
+        await db_pool.release(conn)
+
+
+@contextmanager
+def timed_query(name):
+    """Замер запроса к БД: гистограмма db_query_duration_seconds и отрезок трассы"""
+    with DB_QUERY_SECONDS.time(query=name), start_span(f"db {name}", **{'db.system': 'postgresql'}):
+        yield
 
-    return await asyncpg.connect(**DB_CONFIG)
 
 async def init_db():
-    conn = None
+    global db_pool
     try:
-        conn = await create_db_connection()
-        await conn.execute("SELECT 1 FROM users LIMIT 1")
-        await conn.execute("SELECT 1 FROM operations LIMIT 1")
-        logger.info("Подключение к базе данных успешно")
+        db_pool = await asyncpg.create_pool(
+            **DB_CONFIG,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            max_inactive_connection_lifetime=DB_POOL_MAX_INACTIVE_LIFETIME,
+            statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+            timeout=DB_POOL_ACQUIRE_TIMEOUT
+        )
+        async with acquire_db_connection() as conn:
+            await conn.execute("SELECT 1 FROM users LIMIT 1")
+            await conn.execute("SELECT 1 FROM operations LIMIT 1")
+            applied = await apply_migrations_async(conn, 'RGZ', MIGRATIONS_DIR)
+            if applied:
+                logger.info(f"Применены миграции: {', '.join(applied)}")
+            # Таблицы итогов только что созданы, а операции уже есть
+            needs_backfill = await conn.fetchval(
+                "SELECT NOT EXISTS (SELECT 1 FROM user_balances) "
+                "AND EXISTS (SELECT 1 FROM operations)"
+            )
+        if needs_backfill:
+            await backfill_balances()
+        logger.info(
+            f"Подключение к базе данных успешно "
+            f"(пул: {DB_POOL_MIN_SIZE}-{DB_POOL_MAX_SIZE} соединений)"
+        )
     except Exception as e:
         logger.error(f"Ошибка при проверке таблиц: {str(e)}")
         exit(1)
-    finally:
-        if conn:
-            await conn.close()
+
+
+async def close_db():
+    global db_pool
+    if db_pool:
+        await db_pool.close()
+        db_pool = None
+        logger.info("Пул соединений с базой данных закрыт")
+
+
+# Итоги по дням и за все время (таблицы daily_balances и user_balances)
+def summarize_operations(operations):
+    """Суммирование операций (chat_id, type_operation, sum, date) по дням и пользователям"""
+    daily = {}
+    users = {}
+    for chat_id, operation_type, amount, operation_date in operations:
+        amount = Decimal(str(amount))
+        income = amount if operation_type == 'income' else Decimal(0)
+        expense = amount if operation_type == 'expense' else Decimal(0)
+        for totals, key in ((daily, (chat_id, operation_date)), (users, chat_id)):
+            current = totals.get(key, (Decimal(0), Decimal(0), 0))
+            totals[key] = (current[0] + income, current[1] + expense, current[2] + 1)
+    return daily, users
+
+
+async def apply_balance_rollups(conn, operations):
+    """Прибавление новых операций к итогам; вызывать в транзакции вставки"""
+    daily, users = summarize_operations(operations)
+    await conn.executemany(
+        "INSERT INTO daily_balances (chat_id, day, income, expense, ops_count) "
+        "VALUES ($1, $2, $3, $4, $5) "
+        "ON CONFLICT (chat_id, day) DO UPDATE SET "
+        "income = daily_balances.income + EXCLUDED.income, "
+        "expense = daily_balances.expense + EXCLUDED.expense, "
+        "ops_count = daily_balances.ops_count + EXCLUDED.ops_count",
+        [(chat_id, day, *totals) for (chat_id, day), totals in daily.items()]
+    )
+    await conn.executemany(
+        "INSERT INTO user_balances (chat_id, income, expense, ops_count) "
+        "VALUES ($1, $2, $3, $4) "
+        "ON CONFLICT (chat_id) DO UPDATE SET "
+        "income = user_balances.income + EXCLUDED.income, "
+        "expense = user_balances.expense + EXCLUDED.expense, "
+        "ops_count = user_balances.ops_count + EXCLUDED.ops_count",
+        [(chat_id, *totals) for chat_id, totals in users.items()]
+    )
+
+
+async def record_operation(conn, chat_id, operation_type, amount, operation_date):
+    with timed_query('record_operation'):
+        async with conn.transaction():
+            await conn.execute(INSERT_OPERATION, chat_id, operation_type, amount, operation_date)
+            await apply_balance_rollups(conn, [(chat_id, operation_type, amount, operation_date)])
+
+
+# Буфер пакетной записи; создается в main(), если включен WRITE_BEHIND_ENABLED
+operation_writer = None
+
+
+async def save_operation(chat_id, operation_type, amount, operation_date):
+    """Сохранение операции; возвращается после commit в обоих режимах"""
+    if operation_writer is not None:
+        await operation_writer.write(chat_id, operation_type, amount, operation_date)
+        return
+    async with acquire_db_connection() as conn:
+        await record_operation(conn, chat_id, operation_type, amount, operation_date)
+
+
+async def backfill_balances():
+    """Пересчет итогов по всем существующим операциям"""
+    async with acquire_db_connection() as conn:
+        async with conn.transaction():
+            # Блокировка не дает вставить операцию, пока итоги пересчитываются
+            await conn.execute("LOCK TABLE operations IN SHARE MODE")
+            await conn.execute("TRUNCATE daily_balances, user_balances")
+            await conn.execute(
+                "INSERT INTO daily_balances (chat_id, day, income, expense, ops_count) "
+                "SELECT chat_id, date::date, "
+                "COALESCE(SUM(sum) FILTER (WHERE type_operation = 'income'), 0), "
+                "COALESCE(SUM(sum) FILTER (WHERE type_operation = 'expense'), 0), "
+                "COUNT(*) FROM operations GROUP BY chat_id, date::date"
+            )
+            await conn.execute(
+                "INSERT INTO user_balances (chat_id, income, expense, ops_count) "
+                "SELECT chat_id, SUM(income), SUM(expense), SUM(ops_count) "
+                "FROM daily_balances GROUP BY chat_id"
+            )
+            users_count = await conn.fetchval("SELECT COUNT(*) FROM user_balances")
+    logger.info(f"Итоги пересчитаны для {users_count} пользователей")
 
 
 # Работы с API
-async def get_exchange_rate(currency: str) -> float:
-    if currency == 'RUB':
-        return 1.0
+# Общая HTTP-сессия (keep-alive) создается при запуске в init_http()
+http_session = None
+
+
+async def init_http():
+    global http_session
+    http_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT
+        ),
+        timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+    )
+
+
+async def close_http():
+    global http_session
+    if http_session:
+        await http_session.close()
+        http_session = None
+
+
+# Последний ответ /rates: курсы и ETag для условного запроса
+rates_snapshot = {'etag': None, 'rates': {}}
+
+
+async def fetch_exchange_rates(_key=None) -> dict:
+    """Все курсы одним запросом; если курсы не менялись, сервис отвечает 304"""
+    started = time.perf_counter()
+    status = 'error'
+    with start_span('GET currency_service /rates') as span:
+        # traceparent передает трассу в currency_service
+        headers = inject_headers({})
+        if rates_snapshot['etag']:
+            headers['If-None-Match'] = rates_snapshot['etag']
+
+        try:
+            async with http_session.get(f"{CURRENCY_SERVICE_URL}/rates", headers=headers) as response:
+                status = response.status
+                span.set_attribute('http.status_code', status)
+                if response.status == 304:
+                    return rates_snapshot['rates']
 
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                    f"{CURRENCY_SERVICE_URL}/rate?currency={currency}",
-                    timeout=3
-            ) as response:
                 if response.status == 200:
                     data = await response.json()
-                    return float(data['rate'])
+                    rates_snapshot['rates'] = {c: float(r) for c, r in data['rates'].items()}
+                    rates_snapshot['etag'] = response.headers.get('ETag')
+                    return rates_snapshot['rates']
 
-                logger.warning(f"Не удалось получить курс валюты. Код ответа: {response.status}")
+                logger.warning(f"Не удалось получить курсы валют. Код ответа: {response.status}")
                 return None
 
-    except Exception as e:
-        logger.error(f"Ошибка при получении курса валюты: {str(e)}")
+        except Exception as e:
+            span.set_attribute('error', str(e))
+            logger.error(f"Ошибка при получении курса валюты: {str(e)}")
+            return None
+        finally:
+            UPSTREAM_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, service='currency_service', status=status
+            )
+
+
+rate_cache = AsyncTTLCache(fetch_exchange_rates, ttl=RATE_CACHE_TTL, stale_ttl=RATE_CACHE_STALE_TTL)
+
+# Метрики, которые читаются из существующих счетчиков при запросе /metrics
+CallbackMetric(
+    'rate_cache_lookups_total', 'Обращения к кэшу курсов', lambda: {
+        ('hit',): rate_cache.hits, ('stale',): rate_cache.stale_hits, ('miss',): rate_cache.misses
+    }, labelnames=('result',), kind='counter'
+)
+CallbackMetric(
+    'db_pool_connections', 'Соединения пула БД', lambda: {
+        ('total',): db_pool.get_size(), ('idle',): db_pool.get_idle_size()
+    } if db_pool else None, labelnames=('state',)
+)
+CallbackMetric(
+    'write_behind_operations_total', 'Операции, записанные пакетами',
+    lambda: operation_writer.operations if operation_writer else None, kind='counter'
+)
+CallbackMetric(
+    'write_behind_batches_total', 'Пакеты, записанные буфером операций',
+    lambda: operation_writer.batches if operation_writer else None, kind='counter'
+)
+CallbackMetric(
+    'write_behind_flush_seconds_total', 'Суммарное время записи пакетов',
+    lambda: operation_writer.flush_time_total if operation_writer else None, kind='counter'
+)
+
+
+async def get_exchange_rate(currency: str) -> float:
+    if currency == 'RUB':
+        return 1.0
+    rates = await rate_cache.get('all')
+    if not rates or currency not in rates:
+        logger.warning(f"Курс валюты {currency} недоступен")
         return None
+    return rates[currency]
 
 
 # Клавиатуры
@@ -111,6 +371,8 @@ def get_main_keyboard():
         KeyboardButton(text="📊 Отчеты")
     )
     builder.row(
+        KeyboardButton(text="📥 Импорт"),
+        KeyboardButton(text="📤 Экспорт"),
         KeyboardButton(text="ℹ️ Помощь")
     )
     return builder.as_markup(resize_keyboard=True)
@@ -150,13 +412,12 @@ def get_cancel_keyboard():
 # Обработчики команд
 @dp.message(Command('start'))
 async def cmd_start(message: Message):
-    conn = None
     try:
-        conn = await create_db_connection()
-        user_exists = await conn.fetchval(
-            "SELECT 1 FROM users WHERE chat_id = $1",
-            message.from_user.id
-        )
+        async with acquire_db_connection() as conn:
+            user_exists = await conn.fetchval(
+                "SELECT 1 FROM users WHERE chat_id = $1",
+                message.from_user.id
+            )
 
         if not user_exists:
             await message.answer(
@@ -172,20 +433,16 @@ async def cmd_start(message: Message):
     except Exception as e:
         logger.error(f"Ошибка при обработке /start: {str(e)}")
         await message.answer("⚠️ Произошла ошибка. Пожалуйста, попробуйте позже.")
-    finally:
-        if conn:
-            await conn.close()
 
 
 @dp.message(Command('register'))
 async def cmd_register(message: Message, state: FSMContext):
-    conn = None
     try:
-        conn = await create_db_connection()
-        user_exists = await conn.fetchval(
-            "SELECT 1 FROM users WHERE chat_id = $1",
-            message.from_user.id
-        )
+        async with acquire_db_connection() as conn:
+            user_exists = await conn.fetchval(
+                "SELECT 1 FROM users WHERE chat_id = $1",
+                message.from_user.id
+            )
 
         if user_exists:
             await message.answer("ℹ️ Вы уже зарегистрированы!")
@@ -199,9 +456,6 @@ async def cmd_register(message: Message, state: FSMContext):
     except Exception as e:
         logger.error(f"Ошибка при регистрации: {str(e)}")
         await message.answer("⚠️ Произошла ошибка. Пожалуйста, попробуйте позже.")
-    finally:
-        if conn:
-            await conn.close()
 
 
 @dp.message(RegistrationState.waiting_for_name)
@@ -211,13 +465,12 @@ async def process_registration_name(message: Message, state: FSMContext):
         await message.answer("❌ Регистрация отменена", reply_markup=types.ReplyKeyboardRemove())
         return
 
-    conn = None
     try:
-        conn = await create_db_connection()
-        await conn.execute(
-            "INSERT INTO users (chat_id, name) VALUES ($1, $2)",
-            message.from_user.id, message.text.strip()
-        )
+        async with acquire_db_connection() as conn:
+            await conn.execute(
+                "INSERT INTO users (chat_id, name) VALUES ($1, $2)",
+                message.from_user.id, message.text.strip()
+            )
         await message.answer(
             f"✅ Регистрация успешна, {message.text.strip()}!\n"
             "Теперь вы можете начать вести учет финансов.",
@@ -227,20 +480,17 @@ async def process_registration_name(message: Message, state: FSMContext):
         logger.error(f"Ошибка при завершении регистрации: {str(e)}")
         await message.answer("⚠️ Произошла ошибка при регистрации. Пожалуйста, попробуйте позже.")
     finally:
-        if conn:
-            await conn.close()
         await state.clear()
 
 
 @dp.message(lambda message: message.text == "➕ Добавить операцию")
 async def add_operation_start(message: Message, state: FSMContext):
-    conn = None
     try:
-        conn = await create_db_connection()
-        user_exists = await conn.fetchval(
-            "SELECT 1 FROM users WHERE chat_id = $1",
-            message.from_user.id
-        )
+        async with acquire_db_connection() as conn:
+            user_exists = await conn.fetchval(
+                "SELECT 1 FROM users WHERE chat_id = $1",
+                message.from_user.id
+            )
 
         if not user_exists:
             await message.answer("ℹ️ Пожалуйста, сначала зарегистрируйтесь с помощью /register")
@@ -254,9 +504,6 @@ async def add_operation_start(message: Message, state: FSMContext):
     except Exception as e:
         logger.error(f"Ошибка при начале добавления операции: {str(e)}")
         await message.answer("⚠️ Произошла ошибка. Пожалуйста, попробуйте позже.")
-    finally:
-        if conn:
-            await conn.close()
 
 
 @dp.message(AddOperationState.waiting_for_type)
@@ -315,7 +562,6 @@ async def process_operation_date(message: Message, state: FSMContext):
         return
 
     operation_data = await state.get_data()
-    conn = None
 
     try:
         if message.text == "Сегодня":
@@ -323,9 +569,7 @@ async def process_operation_date(message: Message, state: FSMContext):
         else:
             operation_date = datetime.strptime(message.text, "%d.%m.%Y").date()
 
-        conn = await create_db_connection()
-        await conn.execute(
-            "INSERT INTO operations (chat_id, type_operation, sum, date) VALUES ($1, $2, $3, $4)",
+        await save_operation(
             message.from_user.id,
             operation_data['operation_type'],
             operation_data['amount'],
@@ -347,11 +591,119 @@ async def process_operation_date(message: Message, state: FSMContext):
         logger.error(f"Ошибка при сохранении операции: {str(e)}")
         await message.answer("⚠️ Произошла ошибка при сохранении операции. Пожалуйста, попробуйте позже.")
     finally:
-        if conn:
-            await conn.close()
         await state.clear()
 
 
+@dp.message(Command('import'))
+@dp.message(lambda message: message.text == "📥 Импорт")
+async def import_start(message: Message, state: FSMContext):
+    try:
+        async with acquire_db_connection() as conn:
+            user_exists = await conn.fetchval(
+                "SELECT 1 FROM users WHERE chat_id = $1",
+                message.from_user.id
+            )
+
+        if not user_exists:
+            await message.answer("ℹ️ Пожалуйста, сначала зарегистрируйтесь с помощью /register")
+            return
+
+        await message.answer(
+            "📥 Отправьте CSV-файл с операциями (до 20 МБ, можно сжатый .csv.gz).\n\n"
+            "Колонки: дата (ДД.ММ.ГГГГ или ГГГГ-ММ-ДД), тип (доход/расход), сумма.\n"
+            "Разделитель - запятая или точка с запятой, строка заголовка необязательна.\n"
+            "Таблицу Excel сохраните как CSV (UTF-8).",
+            reply_markup=get_cancel_keyboard()
+        )
+        await state.set_state(ImportState.waiting_for_file)
+    except Exception as e:
+        logger.error(f"Ошибка при начале импорта: {str(e)}")
+        await message.answer("⚠️ Произошла ошибка. Пожалуйста, попробуйте позже.")
+
+
+@dp.message(ImportState.waiting_for_file)
+async def process_import_file(message: Message, state: FSMContext):
+    if message.text == "Отмена":
+        await state.clear()
+        await message.answer("❌ Импорт отменен", reply_markup=get_main_keyboard())
+        return
+
+    document = message.document
+    file_name = (document.file_name or '').lower() if document else ''
+    if not file_name.endswith(('.csv', '.csv.gz')):
+        await message.answer("⚠️ Пожалуйста, отправьте файл с расширением .csv или .csv.gz")
+        return
+    if document.file_size and document.file_size > IMPORT_MAX_FILE_SIZE:
+        await message.answer("⚠️ Файл слишком большой: максимум 20 МБ. Разделите его на части.")
+        return
+
+    await state.clear()
+    progress_message = await message.answer("⏳ Загрузка файла...", reply_markup=get_main_keyboard())
+
+    async def report_progress(imported):
+        try:
+            await progress_message.edit_text(f"⏳ Загружено операций: {imported}")
+        except Exception as e:
+            logger.warning(f"Не удалось обновить прогресс импорта: {str(e)}")
+
+    # Файл скачивается на диск и читается построчно, в памяти только одна часть
+    fd, path = tempfile.mkstemp(suffix='.csv.gz' if file_name.endswith('.gz') else '.csv')
+    os.close(fd)
+    try:
+        await bot.download(document, destination=path)
+        errors = ImportErrors()
+        f, rows = open_csv(path)
+        with f:
+            records = iter_operations(rows, message.from_user.id, errors)
+            async with acquire_db_connection() as conn:
+                with timed_query('import_operations'):
+                    imported = await import_operations(
+                        conn, records, apply_balance_rollups, IMPORT_CHUNK_SIZE, report_progress
+                    )
+
+        text = f"✅ Импорт завершен. Загружено операций: {imported}"
+        if errors.count:
+            text += f"\n\n⚠️ Пропущено строк с ошибками: {errors.count}\n" + "\n".join(errors.details)
+            if errors.count > len(errors.details):
+                text += f"\n... и еще {errors.count - len(errors.details)}"
+        await message.answer(text)
+    except UnicodeDecodeError:
+        await message.answer("⚠️ Не удалось прочитать файл: сохраните его в кодировке UTF-8")
+    except Exception as e:
+        logger.error(f"Ошибка при импорте операций: {str(e)}")
+        await message.answer("⚠️ Произошла ошибка при импорте. Ни одна операция не сохранена, попробуйте позже.")
+    finally:
+        os.remove(path)
+
+
+@dp.message(Command('export'))
+@dp.message(lambda message: message.text == "📤 Экспорт")
+async def export_operations_file(message: Message):
+    # Файл пишется на диск по мере чтения курсора и отправляется документом
+    fd, path = tempfile.mkstemp(suffix='.csv.gz')
+    os.close(fd)
+    try:
+        async with acquire_db_connection() as conn:
+            with timed_query('export_operations'):
+                count = await export_operations(conn, message.from_user.id, path, EXPORT_PREFETCH)
+
+        if count == 0:
+            await message.answer("ℹ️ У вас пока нет операций для экспорта")
+            return
+
+        file_name = f"operations_{datetime.now().strftime('%Y%m%d')}.csv.gz"
+        await message.answer_document(
+            FSInputFile(path, filename=file_name),
+            caption=f"📤 Операций: {count}. Файл можно загрузить обратно через /import.",
+            reply_markup=get_main_keyboard()
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при экспорте операций: {str(e)}")
+        await message.answer("⚠️ Произошла ошибка при экспорте. Пожалуйста, попробуйте позже.")
+    finally:
+        os.remove(path)
+
+
 @dp.message(lambda message: message.text == "📊 Отчеты")
 async def reports_menu(message: Message, state: FSMContext):
     await message.answer(
@@ -387,6 +739,91 @@ async def process_report_currency(message: Message, state: FSMContext):
     await state.set_state(ReportState.waiting_for_period)
 
 
+# Периоды отчетов: текст кнопки -> (код для callback_data, интервал)
+REPORT_PERIODS = {
+    "За сегодня": ('day', timedelta(days=1)),
+    "За неделю": ('week', timedelta(weeks=1)),
+    "За месяц": ('month', timedelta(days=30)),
+    "За все время": ('all', None)
+}
+REPORT_PERIOD_BY_CODE = {code: (title, interval) for title, (code, interval) in REPORT_PERIODS.items()}
+
+
+def report_period_filter(interval):
+    """Условие на дату операции и его параметры (начиная с $2)"""
+    if interval is None:
+        return "", []
+    return " AND date >= (NOW() - $2::interval)", [interval]
+
+
+async def fetch_report_totals(conn, chat_id, interval):
+    """Суммы доходов/расходов и число операций за период из таблиц итогов"""
+    with timed_query('report_totals'):
+        if interval is None:
+            row = await conn.fetchrow(
+                "SELECT income, expense, ops_count FROM user_balances WHERE chat_id = $1",
+                chat_id
+            )
+        else:
+            # Не больше ~31 строки daily_balances; условие то же, что и для operations
+            row = await conn.fetchrow(
+                "SELECT SUM(income) AS income, SUM(expense) AS expense, SUM(ops_count) AS ops_count "
+                "FROM daily_balances WHERE chat_id = $1 AND day >= (NOW() - $2::interval)",
+                chat_id, interval
+            )
+    if not row or not row['ops_count']:
+        return {'income': 0.0, 'expense': 0.0}, 0
+    return {'income': float(row['income']), 'expense': float(row['expense'])}, row['ops_count']
+
+
+async def fetch_report_page(conn, chat_id, interval, offset):
+    """Одна страница последних операций за период"""
+    condition, args = report_period_filter(interval)
+    with timed_query('report_page'):
+        return await conn.fetch(
+            "SELECT type_operation, sum, date FROM operations "
+            f"WHERE chat_id = $1{condition} "
+            # id - уникальный второй ключ: операции одной даты не повторяются
+            # и не пропадают при переходе между страницами
+            f"ORDER BY date DESC, id DESC LIMIT ${len(args) + 2} OFFSET ${len(args) + 3}",
+            chat_id, *args, REPORT_PAGE_SIZE, offset
+        )
+
+
+async def get_report_rate(currency):
+    """Курс для отчета: (валюта, курс), при ошибке - отчет в рублях"""
+    if currency == 'RUB':
+        return currency, 1.0
+    rate = await get_exchange_rate(currency)
+    if rate is None:
+        return 'RUB', 1.0
+    return currency, rate
+
+
+def format_report_page(operations, currency, rate, offset, total_count):
+    lines = [f"🧾 Операции {offset + 1}–{offset + len(operations)} из {total_count}:\n"]
+    for op in operations:
+        amount = float(op['sum']) / rate
+        prefix = "⬆️" if op['type_operation'] == 'income' else "⬇️"
+        lines.append(f"{prefix} {op['date'].strftime('%d.%m.%Y')} - {amount:.2f} {currency}")
+    return "\n".join(lines)
+
+
+def get_report_page_keyboard(period_code, currency, offset, total_count):
+    builder = InlineKeyboardBuilder()
+    if offset > 0:
+        builder.button(
+            text="⬅️ Новее",
+            callback_data=f"report:{period_code}:{currency}:{max(offset - REPORT_PAGE_SIZE, 0)}"
+        )
+    if offset + REPORT_PAGE_SIZE < total_count:
+        builder.button(
+            text="Старее ➡️",
+            callback_data=f"report:{period_code}:{currency}:{offset + REPORT_PAGE_SIZE}"
+        )
+    return builder.as_markup()
+
+
 @dp.message(ReportState.waiting_for_period)
 async def process_report_period(message: Message, state: FSMContext):
     if message.text == "Отмена":
@@ -394,54 +831,30 @@ async def process_report_period(message: Message, state: FSMContext):
         await message.answer("❌ Создание отчета отменено", reply_markup=get_main_keyboard())
         return
 
-    # Преобразование периода в интервал
-    period_mapping = {
-        "За сегодня": timedelta(days=1),
-        "За неделю": timedelta(weeks=1),
-        "За месяц": timedelta(days=30),
-        "За все время": None
-    }
-
-    if message.text not in period_mapping:
+    if message.text not in REPORT_PERIODS:
         await message.answer("Пожалуйста, выберите период из предложенных вариантов")
         return
 
+    period_code, interval = REPORT_PERIODS[message.text]
     report_data = await state.get_data()
-    currency = report_data['currency']
-    conn = None
 
     try:
-        conn = await create_db_connection()
-
         # Получение курс валюты
-        rate = 1.0
-        if currency != 'RUB':
-            rate = await get_exchange_rate(currency)
-            if rate is None:
-                await message.answer(
-                    "⚠️ Не удалось получить курс валюты. Отчет будет в RUB.",
-                    reply_markup=get_main_keyboard()
-                )
-                currency = 'RUB'
-                rate = 1.0
-
-        # Формирование SQL запроса в зависимости от периода
-        if message.text == "За все время":
-            operations = await conn.fetch(
-                "SELECT type_operation, sum, date FROM operations "
-                "WHERE chat_id = $1 ORDER BY date DESC",
-                message.from_user.id
-            )
-        else:
-            operations = await conn.fetch(
-                "SELECT type_operation, sum, date FROM operations "
-                "WHERE chat_id = $1 AND date >= (NOW() - $2::interval) "
-                "ORDER BY date DESC",
-                message.from_user.id,
-                period_mapping[message.text]
+        currency, rate = await get_report_rate(report_data['currency'])
+        if currency != report_data['currency']:
+            await message.answer(
+                "⚠️ Не удалось получить курс валюты. Отчет будет в RUB.",
+                reply_markup=get_main_keyboard()
             )
 
-        if not operations:
+        # Итоги считаются в БД, операции читаются только первой страницей
+        async with acquire_db_connection() as conn:
+            totals, total_count = await fetch_report_totals(conn, message.from_user.id, interval)
+            operations = []
+            if total_count:
+                operations = await fetch_report_page(conn, message.from_user.id, interval, 0)
+
+        if not total_count:
             await message.answer(
                 f"ℹ️ Нет операций за выбранный период ({message.text.lower()})",
                 reply_markup=get_main_keyboard()
@@ -450,29 +863,22 @@ async def process_report_period(message: Message, state: FSMContext):
             return
 
         # Формирование отчёта
-        total_income = 0.0
-        total_expense = 0.0
-        report_lines = [f"📊 Отчет за {message.text.lower()} ({currency}):\n"]
-
-        for op in operations:
-            amount = float(op['sum']) / rate
-            if op['type_operation'] == 'income':
-                total_income += amount
-                prefix = "⬆️"
-            else:
-                total_expense += amount
-                prefix = "⬇️"
-
-            report_lines.append(
-                f"{prefix} {op['date'].strftime('%d.%m.%Y')} - {amount:.2f} {currency}"
-            )
-
+        total_income = totals['income'] / rate
+        total_expense = totals['expense'] / rate
         balance = total_income - total_expense
-        report_lines.append(f"\n💵 Всего доходов: {total_income:.2f} {currency}")
-        report_lines.append(f"💸 Всего расходов: {total_expense:.2f} {currency}")
-        report_lines.append(f"💰 Баланс: {balance:.2f} {currency}")
+        report_lines = [
+            f"📊 Отчет за {message.text.lower()} ({currency}):\n",
+            f"💵 Всего доходов: {total_income:.2f} {currency}",
+            f"💸 Всего расходов: {total_expense:.2f} {currency}",
+            f"💰 Баланс: {balance:.2f} {currency}",
+            f"🔢 Операций: {total_count}"
+        ]
 
         await message.answer("\n".join(report_lines), reply_markup=get_main_keyboard())
+        await message.answer(
+            format_report_page(operations, currency, rate, 0, total_count),
+            reply_markup=get_report_page_keyboard(period_code, currency, 0, total_count)
+        )
     except Exception as e:
         logger.error(f"Ошибка при формировании отчета: {str(e)}")
         await message.answer(
@@ -480,21 +886,53 @@ async def process_report_period(message: Message, state: FSMContext):
             reply_markup=get_main_keyboard()
         )
     finally:
-        if conn:
-            await conn.close()
         await state.clear()
 
 
+@dp.callback_query(F.data.startswith("report:"))
+async def process_report_page(callback: CallbackQuery):
+    try:
+        _, period_code, currency, offset = callback.data.split(":")
+        offset = int(offset)
+        _, interval = REPORT_PERIOD_BY_CODE[period_code]
+    except (ValueError, KeyError):
+        await callback.answer("Некорректный запрос")
+        return
+
+    try:
+        currency, rate = await get_report_rate(currency)
+        async with acquire_db_connection() as conn:
+            _, total_count = await fetch_report_totals(conn, callback.from_user.id, interval)
+            operations = await fetch_report_page(conn, callback.from_user.id, interval, offset)
+
+        if not operations:
+            await callback.answer("Больше операций нет")
+            return
+
+        await callback.message.edit_text(
+            format_report_page(operations, currency, rate, offset, total_count),
+            reply_markup=get_report_page_keyboard(period_code, currency, offset, total_count)
+        )
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Ошибка при получении страницы отчета: {str(e)}")
+        await callback.answer("⚠️ Произошла ошибка. Пожалуйста, попробуйте позже.")
+
+
 @dp.message(lambda message: message.text == "ℹ️ Помощь")
 async def show_help(message: Message):
     help_text = (
         "📚 <b>Помощь по Finance Bot</b>\n\n"
         "Основные команды:\n"
         "/start - Запустить бота\n"
-        "/register - Регистрация\n\n"
+        "/register - Регистрация\n"
+        "/import - Импорт операций из CSV\n"
+        "/export - Выгрузка всех операций в CSV\n\n"
         "Основные функции:\n"
         "➕ Добавить операцию - Внести новую операцию (доход/расход)\n"
-        "📊 Отчеты - Просмотр статистики за период\n\n"
+        "📊 Отчеты - Просмотр статистики за период\n"
+        "📥 Импорт - Загрузка операций из CSV-файла\n"
+        "📤 Экспорт - Все операции одним файлом\n\n"
         "Для добавления операции укажите:\n"
         "1. Тип (доход/расход)\n"
         "2. Сумму\n"
@@ -514,8 +952,31 @@ async def handle_unknown_message(message: Message):
 
 
 async def main():
+    global operation_writer
     await init_db()
-    await dp.start_polling(bot)
+    if len(sys.argv) > 1 and sys.argv[1] == 'backfill':
+        try:
+            await backfill_balances()
+        finally:
+            await close_db()
+        return
+
+    await init_http()
+    if WRITE_BEHIND_ENABLED:
+        operation_writer = OperationWriter(
+            acquire_db_connection, apply_balance_rollups,
+            batch_size=WRITE_BEHIND_BATCH_SIZE,
+            flush_interval=WRITE_BEHIND_FLUSH_INTERVAL,
+            queue_size=WRITE_BEHIND_QUEUE_SIZE
+        )
+        operation_writer.start()
+    try:
+        await run_bot(dp, bot)
+    finally:
+        if operation_writer is not None:
+            await operation_writer.stop()
+        await close_http()
+        await close_db()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,26 @@
+import csv
+import gzip
+
+from csv_import import CSV_HEADER
+
+
+async def export_operations(conn, chat_id, path, prefetch=1000):
+    """Запись всех операций пользователя в сжатый CSV (формат как у импорта).
+
+    Строки читаются серверным курсором по prefetch штук и сразу пишутся в
+    файл, поэтому память не зависит от числа операций. Возвращает их число.
+    """
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        # Серверный курсор asyncpg работает только внутри транзакции
+        async with conn.transaction():
+            async for record in conn.cursor(
+                    "SELECT date, type_operation, sum FROM operations "
+                    "WHERE chat_id = $1 ORDER BY date",
+                    chat_id, prefetch=prefetch
+            ):
+                writer.writerow((record['date'].strftime('%Y-%m-%d'), record['type_operation'], record['sum']))
+                count += 1
+    return count
@@ -0,0 +1,113 @@
+import csv
+import gzip
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+# Колонки файла импорта/экспорта: дата, тип операции, сумма
+CSV_HEADER = ('date', 'type', 'amount')
+HEADER_NAMES = {'date', 'дата', 'type', 'тип', 'amount', 'sum', 'сумма'}
+OPERATION_TYPES = {
+    'income': 'income', 'доход': 'income',
+    'expense': 'expense', 'расход': 'expense',
+}
+DATE_FORMATS = ('%d.%m.%Y', '%Y-%m-%d')
+OPERATION_COLUMNS = ['chat_id', 'type_operation', 'sum', 'date']
+
+
+class ImportErrors:
+    """Счетчик ошибок в строках; хранит только первые max_details описаний"""
+
+    def __init__(self, max_details=20):
+        self.max_details = max_details
+        self.count = 0
+        self.details = []
+
+    def add(self, line_number, text):
+        self.count += 1
+        if len(self.details) < self.max_details:
+            self.details.append(f"строка {line_number}: {text}")
+
+
+def open_csv(path):
+    """Чтение CSV (или .csv.gz) построчно; разделитель (';', табуляция или ',') - по первой строке"""
+    opener = gzip.open if path.endswith('.gz') else open
+    f = opener(path, 'rt', encoding='utf-8-sig', newline='')
+    first_line = f.readline()
+    f.seek(0)
+    # Excel в русской локали сохраняет CSV с ';', а запятая там - десятичный знак
+    delimiter = next((d for d in ';\t' if d in first_line), ',')
+    return f, csv.reader(f, delimiter=delimiter)
+
+
+def parse_date(value):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise ValueError(f"неверная дата '{value}'")
+
+
+def parse_amount(value):
+    try:
+        amount = Decimal(value.replace(' ', '').replace('\xa0', '').replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"неверная сумма '{value}'")
+    if not amount.is_finite() or amount <= 0:
+        raise ValueError(f"сумма должна быть больше нуля: '{value}'")
+    return amount
+
+
+def iter_operations(rows, chat_id, errors):
+    """Проверка строк CSV; выдает записи (chat_id, type_operation, sum, date).
+
+    Строки с ошибками пропускаются и учитываются в errors. Первая строка
+    считается заголовком, если в ней названия колонок.
+    """
+    for line_number, row in enumerate(rows, start=1):
+        row = [value.strip() for value in row]
+        if not any(row):
+            continue
+        if line_number == 1 and row[0].lower() in HEADER_NAMES:
+            continue
+        if len(row) < 3:
+            errors.add(line_number, "ожидается 3 колонки: дата, тип, сумма")
+            continue
+        try:
+            operation_date = parse_date(row[0])
+            operation_type = OPERATION_TYPES.get(row[1].lower())
+            if operation_type is None:
+                raise ValueError(f"неизвестный тип '{row[1]}' (доход/расход)")
+            amount = parse_amount(row[2])
+        except ValueError as e:
+            errors.add(line_number, str(e))
+            continue
+        yield chat_id, operation_type, amount, operation_date
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+async def import_operations(conn, records, rollups, chunk_size=5000, on_progress=None):
+    """Загрузка записей через COPY частями по chunk_size в одной транзакции.
+
+    В памяти одновременно не больше одной части. rollups(conn, chunk)
+    обновляет итоги; on_progress(imported) вызывается после каждой части.
+    Возвращает число загруженных операций.
+    """
+    imported = 0
+    async with conn.transaction():
+        for chunk in chunked(records, chunk_size):
+            await conn.copy_records_to_table('operations', records=chunk, columns=OPERATION_COLUMNS)
+            await rollups(conn, chunk)
+            imported += len(chunk)
+            if on_progress is not None:
+                await on_progress(imported)
+    return imported
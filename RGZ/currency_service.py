@@ -1,24 +1,55 @@
 from flask import Flask, request, jsonify
+import atexit
+import hashlib
+import json
 import logging
-from datetime import datetime
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener
+from datetime import datetime, timezone
+
+from common.metrics import instrument_flask
+from common.tracing import configure_tracing, trace_flask
 
 app = Flask(__name__)
+# Метрики считаются в каждом процессе gunicorn отдельно; при METRICS_PORT
+# каждый воркер отдает их на своем порту (post_fork в gunicorn.conf.py),
+# а общий маршрут /metrics не нужен - его ответ зависел бы от воркера
+instrument_flask(app, metrics_route=not os.getenv('METRICS_PORT'))
+trace_flask(app)
+configure_tracing('currency_service')
 
 # Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('currency_service.log'),
-        logging.StreamHandler()
-    ]
-)
+# Обработчики запросов только кладут записи в очередь, а в файл и консоль
+# их пишет отдельный поток QueueListener
+log_queue = queue.Queue(-1)
+log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+log_handlers = [
+    logging.FileHandler('currency_service.log'),
+    logging.StreamHandler()
+]
+for handler in log_handlers:
+    handler.setFormatter(log_formatter)
+log_listener = QueueListener(log_queue, *log_handlers, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+queue_handler = QueueHandler(log_queue)
+# Итоговое форматирование делают обработчики слушателя
+queue_handler.setFormatter(logging.Formatter('%(message)s'))
+logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
 logger = logging.getLogger(__name__)
 
+# Доля успешных запросов курса, которые попадают в лог (1.0 - все)
+LOG_SUCCESS_SAMPLE_RATE = float(os.getenv('LOG_SUCCESS_SAMPLE_RATE', 1.0))
+
+# Курс и время его последнего изменения (UTC) хранятся вместе:
+# при изменении курса обновляется и updated_at
 CURRENCY_RATES = {
-    'USD': 90.5,
-    'EUR': 98.7,
-    'CNY': 12.3
+    'USD': {'rate': 90.5, 'updated_at': datetime(2026, 10, 18, tzinfo=timezone.utc)},
+    'EUR': {'rate': 98.7, 'updated_at': datetime(2026, 10, 18, tzinfo=timezone.utc)},
+    'CNY': {'rate': 12.3, 'updated_at': datetime(2026, 10, 18, tzinfo=timezone.utc)}
 }
 
 
@@ -36,8 +67,9 @@ def get_exchange_rate():
         return jsonify({"message": "UNKNOWN CURRENCY"}), 400
 
     try:
-        rate = CURRENCY_RATES[currency]
-        logger.info(f"Успешно возвращен курс {currency}: {rate}")
+        rate = CURRENCY_RATES[currency]['rate']
+        if LOG_SUCCESS_SAMPLE_RATE >= 1 or random.random() < LOG_SUCCESS_SAMPLE_RATE:
+            logger.info(f"Успешно возвращен курс {currency}: {rate}")
         return jsonify({
             "currency": currency,
             "rate": rate,
@@ -48,5 +80,36 @@ def get_exchange_rate():
         return jsonify({"message": "UNEXPECTED ERROR"}), 500
 
 
+@app.route('/rates', methods=['GET'])
+def get_exchange_rates():
+    """Получение курсов всех или перечисленных через запятую валют.
+
+    Поддерживает условные запросы (If-None-Match / If-Modified-Since -> 304).
+    """
+    requested = request.args.get('currencies', '')
+    if requested:
+        currencies = sorted({c.strip().upper() for c in requested.split(',') if c.strip()})
+        unknown = [c for c in currencies if c not in CURRENCY_RATES]
+        if unknown:
+            logger.warning(f"Запрошены неизвестные курсы: {', '.join(unknown)}")
+            return jsonify({"message": "UNKNOWN CURRENCY", "currencies": unknown}), 400
+    else:
+        currencies = sorted(CURRENCY_RATES)
+
+    rates = {currency: CURRENCY_RATES[currency]['rate'] for currency in currencies}
+    # Last-Modified и ETag вычисляются из данных, а не из времени запуска
+    # процесса, поэтому совпадают во всех процессах gunicorn
+    updated_at = max(CURRENCY_RATES[currency]['updated_at'] for currency in currencies)
+    data = {"rates": rates, "updated_at": updated_at.isoformat()}
+    version = hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+
+    response = jsonify({"version": version, **data})
+    response.set_etag(version)
+    response.last_modified = updated_at
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
 if __name__ == '__main__':
+    # Режим разработки; для нагрузки: gunicorn -c gunicorn.conf.py currency_service:app
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,48 @@
+# Запуск currency_service в продакшене:
+#     gunicorn -c gunicorn.conf.py currency_service:app
+import multiprocessing
+import os
+
+bind = os.getenv('CURRENCY_SERVICE_BIND', '0.0.0.0:5000')
+
+# Корень репозитория в sys.path - для общих модулей common/
+pythonpath = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Процессы на все ядра, в каждом несколько потоков для ожидания сети
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+keepalive = 5
+backlog = 2048
+
+# Периодический перезапуск процессов против накопления памяти
+max_requests = 10000
+max_requests_jitter = 1000
+timeout = 30
+graceful_timeout = 30
+
+# Приложение импортируется в каждом процессе после fork, чтобы поток
+# записи логов (QueueListener) запускался в каждом из них
+preload_app = False
+
+# Журнал доступа gunicorn пишет строку на каждый запрос - отключен;
+# успешные запросы курса логируются выборочно
+accesslog = None
+errorlog = '-'
+loglevel = 'warning'
+# Метрики: у каждого воркера свой реестр. Если задан METRICS_PORT, воркер
+# отдает /metrics на первом свободном порту METRICS_PORT..METRICS_PORT+workers-1;
+# в Prometheus нужно перечислить все эти порты
+metrics_port = os.getenv('METRICS_PORT')
+
+
+def post_fork(server, worker):
+    if metrics_port:
+        from common.metrics import start_worker_metrics_server
+        metrics_server = start_worker_metrics_server(int(metrics_port), workers)
+        server.log.info(f"Воркер {worker.pid}: метрики на порту {metrics_server.server_address[1]}")
+
+
+raw_env = [
+    f"LOG_SUCCESS_SAMPLE_RATE={os.getenv('LOG_SUCCESS_SAMPLE_RATE', '0.01')}",
+]
@@ -0,0 +1,2 @@
+-- Отчеты фильтруют операции по пользователю и дате и сортируют по (date, id)
+CREATE INDEX IF NOT EXISTS operations_chat_id_date_id_idx ON operations (chat_id, date DESC, id DESC);
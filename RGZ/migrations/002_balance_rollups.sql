@@ -0,0 +1,18 @@
+-- Итоги по пользователю за каждый день и за все время.
+-- Обновляются при каждой вставке в operations; заполнить по уже
+-- существующим операциям: python bot_RGZ.py backfill
+CREATE TABLE IF NOT EXISTS daily_balances (
+    chat_id BIGINT NOT NULL,
+    day DATE NOT NULL,
+    income NUMERIC NOT NULL DEFAULT 0,
+    expense NUMERIC NOT NULL DEFAULT 0,
+    ops_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (chat_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS user_balances (
+    chat_id BIGINT PRIMARY KEY,
+    income NUMERIC NOT NULL DEFAULT 0,
+    expense NUMERIC NOT NULL DEFAULT 0,
+    ops_count INTEGER NOT NULL DEFAULT 0
+);
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+INSERT_OPERATION = "INSERT INTO operations (chat_id, type_operation, sum, date) VALUES ($1, $2, $3, $4)"
+
+# Ошибки из-за данных отдельной операции: только после них пачка
+# повторяется по одной, чтобы плохая строка не отменяла остальные
+ROW_ERRORS = (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError)
+
+
+class OperationWriter:
+    """Буфер записи операций: вставки копятся и пишутся пачками.
+
+    Пачка сбрасывается, когда набралось batch_size операций или прошло
+    flush_interval секунд с первой операции в пачке. Операции и итоги
+    (rollups) пишутся в одной транзакции; write() возвращается только после
+    ее commit, поэтому пользователь получает подтверждение лишь для
+    сохраненной операции. Если пачка отвергнута из-за данных (ROW_ERRORS),
+    операции повторяются по одной; при ошибках соединения, таймауте пула
+    или недоступности БД ошибку сразу получает вся пачка - повтор по одной
+    лишь ждал бы таймаут на каждой операции.
+    """
+
+    def __init__(self, acquire, rollups, batch_size=100, flush_interval=0.05, queue_size=10000):
+        self._acquire = acquire
+        self._rollups = rollups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._task = None
+        self._closed = False
+        self.batches = 0
+        self.operations = 0
+        self.failures = 0
+        self.flush_time_total = 0.0
+        self.flush_time_max = 0.0
+        self.batch_size_max = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def write(self, chat_id, operation_type, amount, operation_date):
+        if self._closed:
+            raise RuntimeError("Буфер записи операций остановлен")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(((chat_id, operation_type, amount, operation_date), future))
+        await future
+
+    async def stop(self):
+        """Запись всех принятых операций и остановка"""
+        if self._task is None:
+            return
+        self._closed = True
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        # Операции, попавшие в очередь уже после сигнала остановки
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None and not item[1].done():
+                item[1].set_exception(RuntimeError("Буфер записи операций остановлен"))
+        logger.info(f"Буфер записи операций остановлен: {self.stats()}")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        # Обработчик, переставший ждать (отмена), подтверждения не получит - не пишем
+        batch = [(record, future) for record, future in batch if not future.done()]
+        if not batch:
+            return
+        records = [record for record, _ in batch]
+        started = time.monotonic()
+        try:
+            async with self._acquire() as conn:
+                async with conn.transaction():
+                    await conn.executemany(INSERT_OPERATION, records)
+                    await self._rollups(conn, records)
+        except Exception as e:
+            self.failures += 1
+            if len(batch) > 1 and isinstance(e, ROW_ERRORS):
+                logger.warning(f"Ошибка данных в пачке из {len(batch)} операций, запись по одной: {str(e)}")
+                for item in batch:
+                    await self._flush([item])
+                return
+            if len(batch) > 1:
+                logger.error(f"Пачка из {len(batch)} операций не записана: {type(e).__name__}: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        elapsed = time.monotonic() - started
+        self.batches += 1
+        self.operations += len(batch)
+        self.flush_time_total += elapsed
+        self.flush_time_max = max(self.flush_time_max, elapsed)
+        self.batch_size_max = max(self.batch_size_max, len(batch))
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'batches': self.batches,
+            'operations': self.operations,
+            'failures': self.failures,
+            'avg_batch_size': round(self.operations / self.batches, 2) if self.batches else 0.0,
+            'max_batch_size': self.batch_size_max,
+            'avg_flush_ms': round(self.flush_time_total / self.batches * 1000, 3) if self.batches else 0.0,
+            'max_flush_ms': round(self.flush_time_max * 1000, 3),
+        }
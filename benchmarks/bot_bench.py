@@ -0,0 +1,443 @@
+"""Замер пропускной способности обработчиков ботов без Telegram.
+
+Обновления (синтетические сценарии или записанные из getUpdates, по одному
+JSON на строку) подаются прямо в Dispatcher.feed_update. Сессия Bot
+подменяется заглушкой, которая отвечает сразу и считает вызовы Bot API;
+база данных - заглушкой в памяти или настоящим Postgres (--db, настройки из
+.env бота), в обоих случаях с подсчетом обращений к БД.
+
+Запускается из корня репозитория с PYTHONPATH=. (боты импортируют common/):
+    PYTHONPATH=. python benchmarks/bot_bench.py rgz --users 200 --rounds 5
+    PYTHONPATH=. python benchmarks/bot_bench.py lab5 --db-latency 1 --json lab5.json
+    PYTHONPATH=. python benchmarks/bot_bench.py lab6 --updates recorded.jsonl
+"""
+import argparse
+import asyncio
+import contextvars
+import importlib.util
+import json
+import logging
+import os
+import sys
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Message, Update
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+BOTS = {
+    'rgz': os.path.join(ROOT, 'RGZ', 'bot_RGZ.py'),
+    'lab5': os.path.join(ROOT, 'lab5', 'Bot 1.2.py'),
+    'lab6': os.path.join(ROOT, 'lab6', 'bot.py'),
+}
+
+# Счетчики текущего обработчика: обращения к БД, HTTP-сервисам и Bot API
+_handler_counters = contextvars.ContextVar('handler_counters', default=None)
+
+
+def count(kind):
+    counters = _handler_counters.get()
+    if counters is not None:
+        counters[kind] = counters.get(kind, 0) + 1
+
+
+# ================== ЗАГЛУШКИ ==================
+
+class FakeSession(BaseSession):
+    """Сессия Bot API без сети: методы, возвращающие Message, получают
+    сообщение-заглушку, остальные - True"""
+
+    async def make_request(self, bot, method, timeout=None):
+        count('bot_api')
+        if method.__returning__ is Message:
+            chat_id = getattr(method, 'chat_id', 0) or 0
+            return Message.model_validate({
+                'message_id': 1,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': getattr(method, 'text', None),
+            }, context={'bot': bot})
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b''
+
+    async def close(self):
+        pass
+
+
+class _Transaction:
+    def __init__(self, transaction):
+        self._transaction = transaction
+
+    async def __aenter__(self):
+        count('db')  # BEGIN
+        if self._transaction is not None:
+            await self._transaction.__aenter__()
+
+    async def __aexit__(self, *exc_info):
+        count('db')  # COMMIT / ROLLBACK
+        if self._transaction is not None:
+            await self._transaction.__aexit__(*exc_info)
+
+
+class CountingConnection:
+    """Обертка соединения asyncpg (или заглушки), считающая обращения к БД"""
+
+    QUERY_METHODS = ('fetch', 'fetchrow', 'fetchval', 'execute', 'executemany', 'copy_records_to_table')
+
+    def __init__(self, conn, latency=0.0):
+        self._conn = conn
+        self._latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._conn, name)
+        if name not in self.QUERY_METHODS:
+            return attr
+
+        async def query(*args, **kwargs):
+            count('db')
+            if self._latency:
+                await asyncio.sleep(self._latency)
+            return await attr(*args, **kwargs)
+        return query
+
+    def transaction(self):
+        return _Transaction(self._conn.transaction() if hasattr(self._conn, 'transaction') else None)
+
+
+class _Acquire:
+    """Результат pool.acquire(): и await, и async with, как у asyncpg"""
+
+    def __init__(self, pool, timeout):
+        self._pool = pool
+        self._timeout = timeout
+        self._conn = None
+
+    def __await__(self):
+        return self._pool._acquire(self._timeout).__await__()
+
+    async def __aenter__(self):
+        self._conn = await self._pool._acquire(self._timeout)
+        return self._conn
+
+    async def __aexit__(self, *exc_info):
+        await self._pool.release(self._conn)
+
+
+class CountingPool:
+    def __init__(self, pool, latency=0.0):
+        self._pool = pool
+        self._latency = latency
+
+    def acquire(self, timeout=None):
+        return _Acquire(self, timeout)
+
+    async def _acquire(self, timeout):
+        if self._pool is None:
+            return CountingConnection(FakeConnection(), self._latency)
+        return CountingConnection(await self._pool.acquire(timeout=timeout), self._latency)
+
+    async def release(self, conn):
+        if self._pool is not None:
+            await self._pool.release(conn._conn)
+
+    def get_size(self):
+        return self._pool.get_size() if self._pool else 0
+
+    def get_idle_size(self):
+        return self._pool.get_idle_size() if self._pool else 0
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+
+
+class FakeConnection:
+    """Соединение-заглушка: правдоподобные ответы на запросы ботов"""
+
+    async def fetch(self, query, *args):
+        if 'FROM operations' in query:
+            return [
+                {'type_operation': 'income' if i % 2 else 'expense', 'sum': Decimal('150.00'), 'date': date.today()}
+                for i in range(20)
+            ]
+        return []
+
+    async def fetchrow(self, query, *args):
+        return {'income': Decimal('3000.00'), 'expense': Decimal('1500.00'), 'ops_count': 40}
+
+    async def fetchval(self, query, *args):
+        if 'RETURNING rate' in query:
+            return Decimal(str(args[1] if query.startswith('INSERT') else args[0]))
+        return 1
+
+    async def execute(self, query, *args):
+        return 'DELETE 1' if query.startswith('DELETE') else 'OK'
+
+    async def executemany(self, query, args):
+        return None
+
+    async def copy_records_to_table(self, table, records, columns=None):
+        return f'COPY {len(records)}'
+
+
+def fake_service_request(responses):
+    """Заглушка ServiceClient.request (lab6): ответ по пути запроса"""
+    async def request(method, path, params=None, json=None):
+        count('http')
+        return responses.get(path, (200, {}))
+    return request
+
+
+# ================== ПОДГОТОВКА БОТОВ ==================
+
+def load_bot(name):
+    path = BOTS[name]
+    os.environ.setdefault('TELEGRAM_BOT_TOKEN', '42:BENCHMARK')
+    os.environ.setdefault('TELEGRAM_TOKEN', '42:BENCHMARK')
+    sys.path.insert(0, os.path.dirname(path))
+    spec = importlib.util.spec_from_file_location(f"bench_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def prepare_rgz(module, args):
+    if args.db:
+        await module.init_db()
+    module.db_pool = CountingPool(module.db_pool if args.db else None, args.db_latency)
+
+    async def fake_rates(_key=None):
+        count('http')
+        return {'USD': 90.5, 'EUR': 98.7, 'CNY': 12.3}
+    module.rate_cache._loader = fake_rates
+
+
+async def prepare_lab5(module, args):
+    if args.db:
+        await module.init_db()
+    module.db_pool = CountingPool(module.db_pool if args.db else None, args.db_latency)
+    if not args.db:
+        module.currencies_map.update({'USD': Decimal('90.5'), 'EUR': Decimal('98.7')})
+        # Каждый десятый пользователь - администратор
+        module.admin_ids.update(str(user_id) for user_id in range(1, args.users + 1, 10))
+
+
+async def prepare_lab6(module, args):
+    currencies = [{'currency_name': 'USD', 'rate': 90.5}, {'currency_name': 'EUR', 'rate': 98.7}]
+    data_responses = {
+        '/currencies': (200, {'currencies': currencies}),
+        '/currencies/lookup': (404, {'error': 'Валюта не найдена'}),
+        '/convert': (200, {'converted_amount': 905.0}),
+    }
+    module.data_service.request = fake_service_request(data_responses)
+    module.currency_service.request = fake_service_request({})
+
+
+PREPARE = {'rgz': prepare_rgz, 'lab5': prepare_lab5, 'lab6': prepare_lab6}
+
+
+# Сценарии: последовательность сообщений одного пользователя за один раунд;
+# ('callback', data) - нажатие инлайн-кнопки
+SCENARIOS = {
+    'rgz': [
+        '/start',
+        '➕ Добавить операцию', 'Доход', '1500.50', 'Сегодня',
+        '📊 Отчеты', 'USD', 'За месяц',
+        ('callback', 'report:month:USD:20'),
+        '📊 Отчеты', 'RUB', 'За все время',
+        'ℹ️ Помощь',
+    ],
+    'lab5': [
+        '/start', '/get_currencies', '/convert', 'usd', '100',
+        '/manage_currency', 'Изменить курс валюты', 'USD', '91.2',
+    ],
+    'lab6': [
+        '/start', '/get_currencies', '/convert', 'USD', '10',
+        '/manage_currency', 'Добавить валюту', 'GBP', '115.3', 'Назад',
+    ],
+}
+
+
+class UpdateFactory:
+    def __init__(self):
+        self.update_id = 0
+
+    def build(self, user_id, step):
+        self.update_id += 1
+        user = {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'}
+        message = {
+            'message_id': self.update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': user,
+        }
+        if isinstance(step, tuple):
+            return Update.model_validate({
+                'update_id': self.update_id,
+                'callback_query': {
+                    'id': str(self.update_id), 'from': user, 'chat_instance': str(user_id),
+                    'data': step[1], 'message': dict(message, text='report'),
+                },
+            })
+        return Update.model_validate({'update_id': self.update_id, 'message': dict(message, text=step)})
+
+
+def synthetic_streams(name, users, rounds):
+    """Обновления по пользователям; у одного пользователя они идут по порядку"""
+    factory = UpdateFactory()
+    return [
+        [factory.build(user_id, step) for _ in range(rounds) for step in SCENARIOS[name]]
+        for user_id in range(1, users + 1)
+    ]
+
+
+def recorded_streams(path):
+    """Записанные обновления (JSON на строку), сгруппированные по чатам"""
+    streams = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                update = Update.model_validate(json.loads(line))
+                event = update.event
+                chat = getattr(event, 'chat', None) or getattr(getattr(event, 'message', None), 'chat', None)
+                streams.setdefault(chat.id if chat else 0, []).append(update)
+    return list(streams.values())
+
+
+# ================== ЗАМЕР ==================
+
+class BenchmarkMiddleware(BaseMiddleware):
+    """Время и счетчики обращений для каждого вызова обработчика"""
+
+    def __init__(self):
+        self.samples = {}
+
+    async def __call__(self, handler, event, data):
+        name = getattr(getattr(data.get('handler'), 'callback', None), '__name__', 'unknown')
+        counters = {}
+        token = _handler_counters.set(counters)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            elapsed = time.perf_counter() - started
+            _handler_counters.reset(token)
+            self.samples.setdefault(name, []).append((elapsed, counters))
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(samples, total_updates, elapsed):
+    handlers = {}
+    totals = {'db': 0, 'http': 0, 'bot_api': 0}
+    for name, items in sorted(samples.items()):
+        latencies = sorted(latency for latency, _ in items)
+        calls = {kind: sum(counters.get(kind, 0) for _, counters in items) for kind in totals}
+        for kind, value in calls.items():
+            totals[kind] += value
+        handlers[name] = {
+            'calls': len(items),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            'db_per_call': round(calls['db'] / len(items), 2),
+            'http_per_call': round(calls['http'] / len(items), 2),
+            'bot_api_per_call': round(calls['bot_api'] / len(items), 2),
+        }
+    return {
+        'updates': total_updates,
+        'seconds': round(elapsed, 3),
+        'updates_per_second': round(total_updates / elapsed, 1) if elapsed else 0.0,
+        'db_per_update': round(totals['db'] / total_updates, 3) if total_updates else 0.0,
+        'http_per_update': round(totals['http'] / total_updates, 3) if total_updates else 0.0,
+        'bot_api_per_update': round(totals['bot_api'] / total_updates, 3) if total_updates else 0.0,
+        'handlers': handlers,
+    }
+
+
+def print_report(name, result):
+    print(f"\n{name}: {result['updates']} обновлений за {result['seconds']} с "
+          f"({result['updates_per_second']} в секунду)")
+    print(f"На обновление: БД {result['db_per_update']}, HTTP {result['http_per_update']}, "
+          f"Bot API {result['bot_api_per_update']}")
+    print(f"{'обработчик':<32}{'вызовов':>8}{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}{'БД':>7}{'HTTP':>7}")
+    for handler, stats in result['handlers'].items():
+        print(f"{handler:<32}{stats['calls']:>8}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+              f"{stats['p99_ms']:>10}{stats['db_per_call']:>7}{stats['http_per_call']:>7}")
+
+
+async def run(args):
+    module = load_bot(args.bot)
+    if not args.log:
+        logging.disable(logging.WARNING)
+    module.bot.session = FakeSession()
+    await PREPARE[args.bot](module, args)
+
+    middleware = BenchmarkMiddleware()
+    module.dp.message.middleware(middleware)
+    module.dp.callback_query.middleware(middleware)
+
+    streams = recorded_streams(args.updates) if args.updates else synthetic_streams(args.bot, args.users, args.rounds)
+    total_updates = sum(len(stream) for stream in streams)
+
+    errors = []
+
+    async def feed(stream):
+        for update in stream:
+            try:
+                await module.dp.feed_update(module.bot, update)
+            except Exception as e:
+                errors.append(f"{update.update_id}: {type(e).__name__}: {e}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(feed(stream) for stream in streams))
+    elapsed = time.perf_counter() - started
+
+    if args.db and hasattr(module, 'close_db'):
+        await module.close_db()
+
+    result = summarize(middleware.samples, total_updates, elapsed)
+    result.update({
+        'errors': len(errors),
+        'bot': args.bot,
+        'db': 'postgres' if args.db else 'memory',
+        'db_latency_ms': args.db_latency * 1000,
+        'recorded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    })
+    print_report(args.bot, result)
+    if errors:
+        print(f"\nОшибок в обработчиках: {len(errors)}, первая: {errors[0]}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер обработчиков бота без Telegram")
+    parser.add_argument('bot', choices=sorted(BOTS))
+    parser.add_argument('--users', type=int, default=100, help="число одновременных пользователей")
+    parser.add_argument('--rounds', type=int, default=5, help="повторов сценария на пользователя")
+    parser.add_argument('--updates', help="файл с записанными обновлениями (JSON на строку)")
+    parser.add_argument('--db', action='store_true', help="настоящий Postgres вместо заглушки")
+    parser.add_argument('--db-latency', type=float, default=0.0,
+                        help="задержка заглушки БД на запрос, мс")
+    parser.add_argument('--json', help="куда сохранить результат")
+    parser.add_argument('--log', action='store_true', help="не отключать логи ботов")
+    args = parser.parse_args()
+    args.db_latency /= 1000
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+
+import asyncpg
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder
+from aiogram.fsm.storage.memory import MemoryStorage
+
+logger = logging.getLogger(__name__)
+
+FSM_KEY_PREFIX = 'fsm'
+
+
+def dumps_compact(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+class PostgresStorage(BaseStorage):
+    """Хранилище FSM в таблице PostgreSQL, общее для нескольких процессов бота.
+
+    Состояние и данные диалога лежат в одной строке; каждая запись
+    продлевает срок жизни строки на ttl секунд, просроченные строки не
+    читаются и периодически удаляются.
+    """
+
+    def __init__(self, db_config, ttl=3600, key_builder=None,
+                 table='fsm_storage', pool_size=5, cleanup_interval=600):
+        self.db_config = db_config
+        self.ttl = timedelta(seconds=ttl)
+        self.key_builder = key_builder or DefaultKeyBuilder(prefix=FSM_KEY_PREFIX, with_bot_id=True)
+        self.table = table
+        self.pool_size = pool_size
+        self.cleanup_interval = cleanup_interval
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+        self._last_cleanup = time.monotonic()
+
+    async def _get_pool(self):
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    pool = await asyncpg.create_pool(**self.db_config, min_size=1, max_size=self.pool_size)
+                    await pool.execute(
+                        f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                        "key TEXT PRIMARY KEY, state TEXT, data TEXT, "
+                        "expires_at TIMESTAMPTZ NOT NULL)"
+                    )
+                    self._pool = pool
+        return self._pool
+
+    async def _cleanup(self, pool):
+        if time.monotonic() - self._last_cleanup < self.cleanup_interval:
+            return
+        self._last_cleanup = time.monotonic()
+        try:
+            await pool.execute(f"DELETE FROM {self.table} WHERE expires_at < NOW()")
+        except Exception as e:
+            logger.error(f"Ошибка при очистке хранилища FSM: {str(e)}")
+
+    async def _write(self, key, column, value):
+        pool = await self._get_pool()
+        # Просроченная, но еще не удаленная строка - брошенный диалог: вторая
+        # колонка очищается, иначе продление срока вернуло бы ее старое значение
+        other = 'data' if column == 'state' else 'state'
+        await pool.execute(
+            f"INSERT INTO {self.table} (key, {column}, expires_at) VALUES ($1, $2, NOW() + $3::interval) "
+            f"ON CONFLICT (key) DO UPDATE SET {column} = EXCLUDED.{column}, "
+            f"{other} = CASE WHEN {self.table}.expires_at <= NOW() THEN NULL ELSE {self.table}.{other} END, "
+            "expires_at = EXCLUDED.expires_at",
+            self.key_builder.build(key), value, self.ttl
+        )
+        await self._cleanup(pool)
+
+    async def _read(self, key, column):
+        pool = await self._get_pool()
+        return await pool.fetchval(
+            f"SELECT {column} FROM {self.table} WHERE key = $1 AND expires_at > NOW()",
+            self.key_builder.build(key)
+        )
+
+    async def set_state(self, key, state=None):
+        await self._write(key, 'state', state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key):
+        return await self._read(key, 'state')
+
+    async def set_data(self, key, data):
+        await self._write(key, 'data', dumps_compact(dict(data)) if data else None)
+
+    async def get_data(self, key):
+        data = await self._read(key, 'data')
+        return json.loads(data) if data else {}
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+def create_fsm_storage(db_config=None):
+    """Хранилище FSM по переменным окружения.
+
+    FSM_STORAGE - memory (по умолчанию, один процесс), postgres или redis;
+    FSM_TTL - через сколько секунд без активности диалог забывается;
+    FSM_REDIS_URL - адрес Redis (или совместимого сервера) для режима redis.
+    """
+    storage_type = os.getenv('FSM_STORAGE', 'memory')
+    ttl = int(os.getenv('FSM_TTL', 3600))
+
+    if storage_type == 'postgres':
+        if not db_config:
+            raise ValueError("Для FSM_STORAGE=postgres нужна конфигурация БД")
+        return PostgresStorage(db_config, ttl=ttl)
+
+    if storage_type == 'redis':
+        # Зависимость redis нужна только в этом режиме
+        from aiogram.fsm.storage.redis import RedisStorage
+        return RedisStorage.from_url(
+            os.getenv('FSM_REDIS_URL', 'redis://localhost:6379/0'),
+            key_builder=DefaultKeyBuilder(prefix=FSM_KEY_PREFIX, with_bot_id=True),
+            state_ttl=ttl,
+            data_ttl=ttl,
+            json_dumps=dumps_compact
+        )
+
+    return MemoryStorage()
@@ -0,0 +1,300 @@
+import bisect
+import threading
+import time
+
+# Границы корзин гистограмм задержек по умолчанию, в секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """Набор метрик процесса и их вывод в текстовом формате Prometheus"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in values]
+
+
+class _Timer:
+    """Замер времени блока: with или async with"""
+
+    def __init__(self, histogram, labels):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._started, **self._labels)
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info):
+        self.__exit__(*exc_info)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Для каждого набора меток: [счетчики по корзинам + последняя для +Inf, сумма]
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def render(self):
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, (('le', _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """Метрика, значение которой читается при каждом запросе /metrics.
+
+    callback возвращает число или словарь {кортеж значений меток: число};
+    подходит для уже существующих счетчиков (кэши, пулы соединений).
+    """
+
+    def __init__(self, name, help, callback, labelnames=(), kind='gauge', registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._callback = callback
+        registry.register(self)
+
+    def render(self):
+        try:
+            values = self._callback()
+        except Exception:
+            return []
+        if values is None:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in values.items()]
+
+
+# ================== ОБЩИЕ МЕТРИКИ ==================
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'Запросы к HTTP-сервису', ('endpoint', 'method', 'status')
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Время обработки запроса', ('endpoint', 'method')
+)
+BOT_UPDATES = Counter(
+    'bot_updates_total', 'Обработанные ботом события', ('handler', 'status')
+)
+BOT_HANDLER_SECONDS = Histogram(
+    'bot_handler_duration_seconds', 'Время работы обработчика бота', ('handler',)
+)
+DB_QUERY_SECONDS = Histogram(
+    'db_query_duration_seconds', 'Время запросов к БД', ('query',)
+)
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    'upstream_request_duration_seconds', 'Время запросов к внешним сервисам', ('service', 'status')
+)
+
+
+def instrument_flask(app, registry=REGISTRY, metrics_route=True):
+    """Счетчики и задержки по эндпоинтам Flask-приложения и маршрут /metrics.
+
+    metrics_route=False - без маршрута: метрики отдает отдельный сервер
+    процесса (start_worker_metrics_server при нескольких воркерах).
+    """
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            # Шаблон маршрута, а не путь: число меток не растет от параметров
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, endpoint=endpoint, method=request.method
+            )
+        return response
+
+    if metrics_route:
+        @app.route('/metrics', methods=['GET'])
+        def metrics():
+            return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    return app
+
+
+def setup_bot_metrics(dispatcher):
+    """Счетчики и задержки обработчиков сообщений и callback-запросов бота"""
+    from aiogram import BaseMiddleware
+
+    class MetricsMiddleware(BaseMiddleware):
+        async def __call__(self, handler, event, data):
+            handler_object = data.get('handler')
+            name = getattr(getattr(handler_object, 'callback', None), '__name__', 'unknown')
+            started = time.perf_counter()
+            status = 'ok'
+            try:
+                return await handler(event, data)
+            except Exception:
+                status = 'error'
+                raise
+            finally:
+                BOT_HANDLER_SECONDS.observe(time.perf_counter() - started, handler=name)
+                BOT_UPDATES.inc(handler=name, status=status)
+
+    middleware = MetricsMiddleware()
+    dispatcher.message.middleware(middleware)
+    dispatcher.callback_query.middleware(middleware)
+
+
+async def start_metrics_server(port, host='0.0.0.0', registry=REGISTRY):
+    """HTTP-сервер /metrics на отдельном порту (для ботов). Возвращает AppRunner"""
+    from aiohttp import web
+
+    async def metrics(request):
+        return web.Response(text=registry.render(), content_type='text/plain')
+
+    app = web.Application()
+    app.router.add_get('/metrics', metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def start_metrics_thread(port, host='0.0.0.0', registry=REGISTRY):
+    """HTTP-сервер /metrics в отдельном потоке (для процессов без asyncio).
+
+    Возвращает сервер; порт занят - OSError.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+
+def start_worker_metrics_server(base_port, slots, host='0.0.0.0', registry=REGISTRY):
+    """/metrics процесса-воркера на первом свободном порту base_port..base_port+slots-1.
+
+    У каждого воркера gunicorn свой реестр, поэтому каждый отдает метрики
+    на своем порту, а Prometheus опрашивает все порты: счетчики разных
+    процессов не смешиваются. Порт завершившегося воркера занимает его замена.
+    """
+    for port in range(base_port, base_port + slots):
+        try:
+            return start_metrics_thread(port, host, registry)
+        except OSError:
+            continue
+    raise RuntimeError(f"Нет свободного порта для метрик в диапазоне {base_port}-{base_port + slots - 1}")
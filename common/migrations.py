@@ -0,0 +1,64 @@
+import os
+
+# Примененные миграции: (сервис, имя файла) - каждый файл выполняется один раз
+MIGRATIONS_TABLE = 'schema_migrations'
+# Ключ pg_advisory_xact_lock: процессы, стартующие одновременно, применяют миграции по очереди
+MIGRATIONS_LOCK_ID = 730501
+
+CREATE_MIGRATIONS_TABLE = (
+    f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+    "service TEXT NOT NULL, name TEXT NOT NULL, "
+    "applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW(), "
+    "PRIMARY KEY (service, name))"
+)
+
+
+def list_migrations(directory):
+    """(имя, SQL) файлов .sql каталога по порядку имен"""
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith('.sql'):
+            with open(os.path.join(directory, file_name), encoding='utf-8') as f:
+                yield file_name, f.read()
+
+
+async def apply_migrations_async(conn, service, directory):
+    """Применение еще не примененных миграций через соединение asyncpg.
+
+    Все новые файлы и записи о них выполняются в одной транзакции.
+    Возвращает имена примененных сейчас файлов.
+    """
+    applied_now = []
+    async with conn.transaction():
+        await conn.execute("SELECT pg_advisory_xact_lock($1)", MIGRATIONS_LOCK_ID)
+        await conn.execute(CREATE_MIGRATIONS_TABLE)
+        rows = await conn.fetch(f"SELECT name FROM {MIGRATIONS_TABLE} WHERE service = $1", service)
+        applied = {row['name'] for row in rows}
+        for name, sql in list_migrations(directory):
+            if name in applied:
+                continue
+            await conn.execute(sql)
+            await conn.execute(
+                f"INSERT INTO {MIGRATIONS_TABLE} (service, name) VALUES ($1, $2)", service, name
+            )
+            applied_now.append(name)
+    return applied_now
+
+
+def apply_migrations(conn, service, directory):
+    """То же для соединения psycopg2: выполняется в текущей транзакции,
+    commit делает вызывающий код"""
+    applied_now = []
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATIONS_LOCK_ID,))
+        cur.execute(CREATE_MIGRATIONS_TABLE)
+        cur.execute(f"SELECT name FROM {MIGRATIONS_TABLE} WHERE service = %s", (service,))
+        applied = {row[0] for row in cur.fetchall()}
+        for name, sql in list_migrations(directory):
+            if name in applied:
+                continue
+            cur.execute(sql)
+            cur.execute(
+                f"INSERT INTO {MIGRATIONS_TABLE} (service, name) VALUES (%s, %s)", (service, name)
+            )
+            applied_now.append(name)
+    return applied_now
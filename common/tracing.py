@@ -0,0 +1,294 @@
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+TRACEPARENT_HEADER = 'traceparent'
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """Отрезок работы внутри трассы; используется как with или async with"""
+
+    sampled = True
+
+    def __init__(self, tracer, name, trace_id, parent_id, attributes):
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.error = None
+        self.start_ns = None
+        self.end_ns = None
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self._tracer.exporter.export(self._tracer.service_name, self)
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info):
+        self.__exit__(*exc_info)
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+class _NoopSpan:
+    """Отрезок трассы, не попавшей в выборку: ничего не замеряет и не пишет.
+
+    Хранит trace_id и решение о выборке в контексте, чтобы дочерние отрезки
+    не разыгрывали выборку заново, а исходящие запросы получали traceparent
+    с флагом 00. Без trace_id (трассировка выключена) контекст не меняется.
+    """
+
+    sampled = False
+
+    def __init__(self, trace_id=None, span_id=None):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self._token = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        if self.trace_id is not None:
+            self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._token is not None:
+            _current_span.reset(self._token)
+            self._token = None
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info):
+        self.__exit__(*exc_info)
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-00"
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def parse_traceparent(value):
+    """Заголовок W3C traceparent -> (trace_id, span_id, sampled) или None"""
+    parts = (value or '').strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+# ================== ЭКСПОРТ ==================
+
+def span_to_dict(service_name, span):
+    """Отрезок в виде JSON-объекта в духе OTLP"""
+    return {
+        'resource': {'service.name': service_name},
+        'traceId': span.trace_id,
+        'spanId': span.span_id,
+        'parentSpanId': span.parent_id or '',
+        'name': span.name,
+        'startTimeUnixNano': span.start_ns,
+        'endTimeUnixNano': span.end_ns,
+        'durationMs': round((span.end_ns - span.start_ns) / 1e6, 3),
+        'attributes': span.attributes,
+        'status': {'code': 'ERROR', 'message': span.error} if span.error else {'code': 'OK'},
+    }
+
+
+class NullExporter:
+    def export(self, service_name, span):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+class InMemoryExporter:
+    """Хранит завершенные отрезки в списке (для тестов и замеров)"""
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, service_name, span):
+        self.spans.append(span_to_dict(service_name, span))
+
+    def shutdown(self):
+        pass
+
+
+class JsonlFileExporter:
+    """Запись отрезков в файл по строке JSON; пишет отдельный поток,
+    чтобы обработчики (в том числе асинхронные) не ждали диск"""
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._write, name='trace-exporter', daemon=True)
+        self._thread.start()
+
+    def export(self, service_name, span):
+        try:
+            self._queue.put_nowait(span_to_dict(service_name, span))
+        except queue.Full:
+            # Трассировка не должна замедлять работу: лишние отрезки теряются
+            pass
+
+    def _write(self):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                f.write(json.dumps(item, ensure_ascii=False, default=str) + '\n')
+                if self._queue.empty():
+                    f.flush()
+
+    def shutdown(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+# ================== ТРАССИРОВЩИК ==================
+
+class Tracer:
+    def __init__(self, service_name='unknown', sample_rate=0.0, exporter=None):
+        self.service_name = service_name
+        self.sample_rate = sample_rate
+        self.exporter = exporter or NullExporter()
+
+    def start_span(self, name, traceparent=None, **attributes):
+        """Новый отрезок: дочерний для текущего, для заголовка traceparent
+        или корень новой трассы, если она попала в выборку sample_rate"""
+        parent = _current_span.get()
+        if parent is not None:
+            if not parent.sampled:
+                return _NoopSpan(parent.trace_id, parent.span_id)
+            return Span(self, name, parent.trace_id, parent.span_id, attributes)
+        remote = parse_traceparent(traceparent) if traceparent else None
+        if remote is not None:
+            trace_id, parent_id, sampled = remote
+            if not sampled:
+                return _NoopSpan(trace_id, parent_id)
+            return Span(self, name, trace_id, parent_id, attributes)
+        if self.sample_rate <= 0:
+            return NOOP_SPAN
+        trace_id = f"{random.getrandbits(128):032x}"
+        if random.random() >= self.sample_rate:
+            # Решение "не в выборке" запоминается для всей трассы
+            return _NoopSpan(trace_id, f"{random.getrandbits(64):016x}")
+        return Span(self, name, trace_id, None, attributes)
+
+
+tracer = Tracer()
+
+
+def configure_tracing(service_name, sample_rate=None, exporter=None):
+    """Настройка трассировки процесса.
+
+    По умолчанию берется из окружения: TRACE_SAMPLE_RATE (доля трасс,
+    0 - выключено) и TRACE_EXPORT_PATH (файл JSONL для отрезков; {pid} в
+    пути заменяется номером процесса - для нескольких воркеров gunicorn).
+    """
+    if sample_rate is None:
+        sample_rate = float(os.getenv('TRACE_SAMPLE_RATE', 0))
+    if exporter is None:
+        export_path = os.getenv('TRACE_EXPORT_PATH')
+        if export_path and sample_rate > 0:
+            exporter = JsonlFileExporter(export_path.format(pid=os.getpid()))
+            atexit.register(exporter.shutdown)
+    tracer.service_name = service_name
+    tracer.sample_rate = sample_rate
+    tracer.exporter = exporter or NullExporter()
+    return tracer
+
+
+def start_span(name, traceparent=None, **attributes):
+    return tracer.start_span(name, traceparent, **attributes)
+
+
+def inject_headers(headers):
+    """Добавление traceparent текущего отрезка в заголовки исходящего запроса"""
+    span = _current_span.get()
+    if span is not None:
+        headers[TRACEPARENT_HEADER] = span.traceparent
+    return headers
+
+
+def trace_flask(app):
+    """Отрезок на каждый запрос Flask; продолжает трассу из заголовка traceparent"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_span():
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        span = start_span(
+            f"{request.method} {endpoint}", request.headers.get(TRACEPARENT_HEADER),
+            **{'http.method': request.method, 'http.route': endpoint}
+        )
+        if span is not NOOP_SPAN:
+            span.__enter__()
+            g.trace_span = span
+
+    @app.teardown_request
+    def _end_request_span(exc):
+        span = g.pop('trace_span', None)
+        if span is not None:
+            span.__exit__(type(exc) if exc else None, exc, None)
+
+    @app.after_request
+    def _record_status(response):
+        span = g.get('trace_span')
+        if span is not None:
+            span.set_attribute('http.status_code', response.status_code)
+        return response
+
+    return app
+
+
+def setup_bot_tracing(dispatcher):
+    """Отрезок на каждый обработчик сообщений и callback-запросов бота"""
+    from aiogram import BaseMiddleware
+
+    class TracingMiddleware(BaseMiddleware):
+        async def __call__(self, handler, event, data):
+            handler_object = data.get('handler')
+            name = getattr(getattr(handler_object, 'callback', None), '__name__', 'unknown')
+            async with start_span(f"handler {name}"):
+                return await handler(event, data)
+
+    middleware = TracingMiddleware()
+    dispatcher.message.middleware(middleware)
+    dispatcher.callback_query.middleware(middleware)
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import os
+import secrets
+
+from aiogram.types import Update
+from aiohttp import web
+
+from common.metrics import start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+
+def get_update_chat_id(update):
+    """Чат, к которому относится обновление (для сохранения порядка внутри чата)"""
+    try:
+        event = update.event
+    except LookupError:
+        # Неизвестный aiogram тип обновления: диспетчер его пропустит, как при polling
+        return update.update_id
+    chat = getattr(event, 'chat', None)
+    if chat is None and getattr(event, 'message', None) is not None:
+        chat = getattr(event.message, 'chat', None)
+    if chat is not None:
+        return chat.id
+    user = getattr(event, 'from_user', None)
+    return user.id if user is not None else update.update_id
+
+
+class UpdateWorkerPool:
+    """Пул обработчиков обновлений с ограниченными очередями.
+
+    Обновление попадает в очередь обработчика по номеру чата, поэтому
+    сообщения одного чата обрабатываются строго по порядку, а разные чаты -
+    параллельно в workers задачах. Если очередь заполнена дольше
+    put_timeout секунд, обновление не принимается (Telegram повторит его позже).
+    """
+
+    def __init__(self, dispatcher, bot, workers, queue_size, put_timeout):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.put_timeout = put_timeout
+        per_worker = max(queue_size // workers, 1)
+        self.queues = [asyncio.Queue(maxsize=per_worker) for _ in range(workers)]
+        self.tasks = []
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self._work(queue)) for queue in self.queues]
+
+    async def put(self, update):
+        queue = self.queues[get_update_chat_id(update) % len(self.queues)]
+        try:
+            await asyncio.wait_for(queue.put(update), timeout=self.put_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _work(self, queue):
+        while True:
+            update = await queue.get()
+            try:
+                await self.dispatcher.feed_update(self.bot, update)
+            except Exception as e:
+                logger.error(f"Ошибка при обработке обновления {update.update_id}: {str(e)}")
+            finally:
+                queue.task_done()
+
+    async def stop(self, drain_timeout=10):
+        # Сначала дорабатываем уже принятые обновления
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self.queues)), timeout=drain_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Не все принятые обновления обработаны до остановки")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+def create_webhook_app(bot, pool, path, secret_token):
+    async def handle_update(request):
+        received_token = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not secrets.compare_digest(received_token, secret_token):
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={'bot': bot})
+        except ValueError:
+            # Некорректный JSON или не объект Update
+            return web.Response(status=400)
+        if not await pool.put(update):
+            # Перегрузка: Telegram повторит доставку позже
+            return web.Response(status=503)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    return app
+
+
+async def run_webhook(dispatcher, bot, webhook_url, **kwargs):
+    """Запуск бота в режиме вебхука вместо long polling.
+
+    Настройки (переменные окружения): WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH,
+    WEBHOOK_SECRET, WEBHOOK_WORKERS (параллельные обработчики),
+    WEBHOOK_QUEUE_SIZE (всего принятых, но не обработанных обновлений),
+    WEBHOOK_PUT_TIMEOUT. WEBHOOK_SECRET обязателен: случайный секрет в каждом
+    процессе перезаписывался бы при set_webhook другим экземпляром бота.
+    kwargs передаются обработчикам как при start_polling.
+    """
+    host = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+    port = int(os.getenv('WEBHOOK_PORT', 8080))
+    path = os.getenv('WEBHOOK_PATH', '/webhook')
+    secret_token = os.getenv('WEBHOOK_SECRET')
+    if not secret_token:
+        raise RuntimeError("Для режима вебхука необходимо задать WEBHOOK_SECRET")
+    workers = int(os.getenv('WEBHOOK_WORKERS', 16))
+    queue_size = int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000))
+    put_timeout = float(os.getenv('WEBHOOK_PUT_TIMEOUT', 5))
+
+    dispatcher.workflow_data.update(kwargs)
+    workflow_data = {'dispatcher': dispatcher, 'bots': [bot], **dispatcher.workflow_data}
+    pool = UpdateWorkerPool(dispatcher, bot, workers, queue_size, put_timeout)
+    runner = web.AppRunner(create_webhook_app(bot, pool, path, secret_token))
+
+    await dispatcher.emit_startup(bot=bot, **workflow_data)
+    pool.start()
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+        await bot.set_webhook(
+            f"{webhook_url.rstrip('/')}{path}",
+            secret_token=secret_token,
+            max_connections=min(workers * 2, 100),
+            allowed_updates=dispatcher.resolve_used_update_types()
+        )
+        logger.info(f"Вебхук запущен на {host}:{port}{path}, обработчиков: {workers}")
+        await asyncio.Event().wait()
+    finally:
+        # Новые обновления больше не принимаются; принятые дорабатываются
+        await runner.shutdown()
+        await pool.stop()
+        await runner.cleanup()
+        await dispatcher.emit_shutdown(bot=bot, **workflow_data)
+
+
+async def run_bot(dispatcher, bot, **kwargs):
+    """Вебхук, если задан WEBHOOK_URL (внешний адрес бота), иначе long polling.
+
+    Если задан METRICS_PORT, на этом порту дополнительно отдаются /metrics.
+    """
+    webhook_url = os.getenv('WEBHOOK_URL')
+    metrics_port = os.getenv('METRICS_PORT')
+    metrics_runner = await start_metrics_server(int(metrics_port)) if metrics_port else None
+    try:
+        if webhook_url:
+            await run_webhook(dispatcher, bot, webhook_url, **kwargs)
+        else:
+            await bot.delete_webhook()
+            await dispatcher.start_polling(bot, **kwargs)
+    finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
@@ -33,30 +33,280 @@
 
 
 # 1.4
+# Потоковая статистика по числам из stdin или файлов: данные читаются
+# большими блоками байтов, в памяти хранится только текущий блок.
+#
+#   python task_1.py < numbers.txt
+#   python task_1.py data1.txt data2.txt.gz --workers 4
+import argparse
+import gzip
+import math
+from decimal import Decimal
+import os
 import sys
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Размер блока чтения в байтах
+CHUNK_SIZE = int(os.getenv('STATS_CHUNK_SIZE', 4 * 1024 * 1024))
+
+WHITESPACE = b' \t\n\r\v\f'
+
+
+class Stats:
+    """Сумма, количество, минимум, максимум, среднее и дисперсия за один проход.
+
+    Для блока считаются среднее и сумма квадратов отклонений (m2), затем
+    блоки и части из разных процессов объединяются формулой Чана -
+    обобщением алгоритма Уэлфорда на пары выборок. Сумма целых чисел
+    точная; если числа не помещаются во float, mean и m2 равны None.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def from_values(cls, values):
+        """Статистика одного блока: сумма и экстремумы встроенными функциями,
+        m2 - вторым проходом по блоку, который уже лежит в памяти"""
+        stats = cls()
+        if not values:
+            return stats
+        stats.count = len(values)
+        stats.total = sum(values)
+        try:
+            stats.mean = stats.total / stats.count
+            mean = stats.mean
+            stats.m2 = math.fsum((x - mean) * (x - mean) for x in values)
+        except OverflowError:
+            stats.mean = stats.m2 = None
+        stats.min = min(values)
+        stats.max = max(values)
+        return stats
+
+    @classmethod
+    def from_array(cls, array):
+        stats = cls()
+        if not array.size:
+            return stats
+        stats.count = int(array.size)
+        stats.total = float(array.sum())
+        stats.mean = stats.total / stats.count
+        stats.m2 = float(((array - stats.mean) ** 2).sum())
+        stats.min = float(array.min())
+        stats.max = float(array.max())
+        return stats
+
+    def merge(self, other):
+        """Объединение с другой частью (Чан и др.)"""
+        if not other.count:
+            return self
+        if not self.count:
+            self.__dict__.update(other.__dict__)
+            return self
+        count = self.count + other.count
+        if self.mean is None or other.mean is None:
+            self.mean = self.m2 = None
+        else:
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / count
+            self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Дисперсия генеральной совокупности"""
+        return self.m2 / self.count if self.count and self.m2 is not None else None
+
+    @property
+    def exact_mean(self):
+        """Среднее по точной сумме; целая сумма вне диапазона float делится в Decimal"""
+        try:
+            return self.total / self.count
+        except OverflowError:
+            return Decimal(self.total) / self.count
+
+
+def parse_chunk(chunk, use_numpy=False):
+    """Блок байтов с целыми токенами -> Stats.
+
+    Целые числа складываются точно (int Python); если в блоке есть
+    дробные, весь блок разбирается как float.
+    """
+    if use_numpy:
+        with warnings.catch_warnings():
+            # Недочитанная строка (не число в данных) - предупреждение numpy;
+            # такой блок разбирается заново медленным путем, чтобы выдать ошибку
+            warnings.simplefilter('error')
+            try:
+                return Stats.from_array(np.fromstring(chunk, dtype=np.float64, sep=' '))
+            except (DeprecationWarning, ValueError):
+                pass
+    tokens = chunk.split()
+    try:
+        values = list(map(int, tokens))
+    except ValueError:
+        try:
+            values = list(map(float, tokens))
+        except ValueError:
+            bad = next(t for t in tokens if not is_number(t))
+            raise ValueError(f"'{bad.decode(errors='replace')}' не является числом") from None
+    return Stats.from_values(values)
+
+
+def is_number(token):
+    try:
+        float(token)
+        return True
+    except ValueError:
+        return False
+
+
+def iter_chunks(stream, chunk_size=CHUNK_SIZE, limit=None):
+    """Блоки из stream, оканчивающиеся на границе чисел.
+
+    Хвост после последнего пробельного символа (начало числа, разрезанного
+    границей блока) переносится в следующий блок. limit - сколько байтов
+    прочитать всего (для частей файла в многопроцессном режиме).
+    """
+    tail = b''
+    while limit is None or limit > 0:
+        size = chunk_size if limit is None else min(chunk_size, limit)
+        data = stream.read(size)
+        if not data:
+            break
+        if limit is not None:
+            limit -= len(data)
+        data = tail + data
+        cut = max(data.rfind(c) for c in (b' ', b'\n', b'\t', b'\r', b'\v', b'\f'))
+        if cut < 0:
+            tail = data
+            continue
+        tail = data[cut + 1:]
+        yield data[:cut + 1]
+    if tail:
+        yield tail
+
+
+def open_input(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def stream_stats(stream, use_numpy=False, chunk_size=CHUNK_SIZE):
+    stats = Stats()
+    for chunk in iter_chunks(stream, chunk_size):
+        stats.merge(parse_chunk(chunk, use_numpy))
+    return stats
+
+
+# ================== МНОГОПРОЦЕССНЫЙ РЕЖИМ ==================
+
+def split_file(path, parts):
+    """Границы частей файла: каждая граница сдвигается вперед
+    до пробельного символа, чтобы не разрезать число"""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as f:
+        for i in range(1, parts):
+            offset = max(size * i // parts, bounds[-1])
+            f.seek(offset)
+            while True:
+                byte = f.read(1)
+                if not byte or byte in WHITESPACE:
+                    break
+                offset += 1
+            bounds.append(min(offset, size))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def file_part_stats(path, start, end, use_numpy, chunk_size):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        stats = Stats()
+        for chunk in iter_chunks(f, chunk_size, limit=end - start):
+            stats.merge(parse_chunk(chunk, use_numpy))
+        return stats
+
+
+def file_stats_parallel(path, workers, use_numpy=False, chunk_size=CHUNK_SIZE):
+    stats = Stats()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(file_part_stats, path, start, end, use_numpy, chunk_size)
+            for start, end in split_file(path, workers)
+        ]
+        # Объединение в порядке частей: результат не зависит от планировщика
+        for future in futures:
+            stats.merge(future.result())
+    return stats
+
+
+def collect_stats(paths, workers=1, use_numpy=False, chunk_size=CHUNK_SIZE):
+    if not paths:
+        return stream_stats(sys.stdin.buffer, use_numpy, chunk_size)
+    stats = Stats()
+    for path in paths:
+        # Сжатый файл нельзя читать с произвольного места - только целиком
+        if workers > 1 and not path.endswith('.gz'):
+            stats.merge(file_stats_parallel(path, workers, use_numpy, chunk_size))
+        else:
+            with open_input(path) as f:
+                stats.merge(stream_stats(f, use_numpy, chunk_size))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Статистика по числам, разделенным пробелами')
+    parser.add_argument('files', nargs='*', help='Файлы с числами (.gz - сжатые); без них читается stdin')
+    parser.add_argument('--workers', type=int, default=1, help='Число процессов для файлов')
+    parser.add_argument('--numpy', action='store_true', help='Разбор блоков через NumPy (float64)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Размер блока чтения, байт')
+    args = parser.parse_args()
+
+    if args.numpy and np is None:
+        parser.error('NumPy не установлен')
+    if args.workers < 1 or args.chunk_size < 1:
+        parser.error('--workers и --chunk-size должны быть положительными')
+
+    try:
+        stats = collect_stats(args.files, args.workers, args.numpy, args.chunk_size)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        sys.exit(1)
+    except OverflowError:
+        # Сложение огромного целого с дробным числом
+        print("Ошибка: сумма не помещается во float (большие целые вместе с дробными числами)",
+              file=sys.stderr)
+        sys.exit(1)
+
+    print(f"Сумма всех чисел: {stats.total}")
+    print(f"Количество всех чисел: {stats.count}")
+    if stats.count:
+        print(f"Минимум: {stats.min}")
+        print(f"Максимум: {stats.max}")
+        print(f"Среднее: {stats.exact_mean}")
+        if stats.variance is None:
+            print("Дисперсия: не вычисляется (числа вне диапазона float)")
+        else:
+            print(f"Дисперсия: {stats.variance}")
+
 
-input_data = sys.stdin.readline().strip()
-
-numbers = []
-current_number = ''
-for char in input_data:
-    if char == ' ':
-        if current_number:
-            numbers.append(int(current_number))
-            current_number = ''
-    else:
-        current_number += char
-if current_number:
-    numbers.append(int(current_number))
-
-sum_of_numbers = 0
-count_of_numbers = 0
-
-i = 0
-while i < len(numbers):
-    sum_of_numbers += numbers[i]
-    count_of_numbers += 1
-    i += 1
-
-print(f"Сумма всех чисел: {sum_of_numbers}")
-print(f"Количество всех чисел: {count_of_numbers}")
+if __name__ == '__main__':
+    main()
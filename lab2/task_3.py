@@ -1,37 +1,247 @@
+import argparse
+import heapq
+import itertools
 import sys
+import warnings
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Чтение блоков файла/stdin с переносом разрезанного числа - как в задании 1.4
+from task_1 import CHUNK_SIZE, iter_chunks, open_input
+
+# Сколько чисел выводится за одну запись в stdout
+OUTPUT_BATCH = 65536
+
+INT64_SIZE = array('q').itemsize
+
+
+class ArrayScan:
+    """Один проход по массиву блоками: максимум с индексом и нечетные числа.
+
+    Сам массив не хранится: каждый элемент блока просматривается один раз.
+    Нечетные числа блока сортируются и сохраняются отрезком - в array('q')
+    (compact) или в списке int произвольной величины (числа из argv); при
+    выводе отрезки сливаются heapq.merge без сборки полного списка.
+    При top хранятся только top наибольших нечетных чисел.
+    """
+
+    def __init__(self, top=None, compact=True):
+        self.top = top
+        self.compact = compact
+        self.count = 0
+        self.odd_count = 0
+        self.max_val = None
+        self.max_index = None
+        # Отсортированные по убыванию отрезки нечетных чисел (без top)
+        self.runs = []
+        self.largest = []
+
+    def feed(self, values):
+        if not len(values):
+            return
+        best, best_index = self.max_val, self.max_index
+        if best is None:
+            best, best_index = values[0], self.count
+        odd = []
+        append = odd.append
+        for index, x in enumerate(values, self.count):
+            # Строгое сравнение: при равных значениях остается первый индекс
+            if x > best:
+                best, best_index = x, index
+            if x % 2 != 0:
+                append(x)
+        self.max_val, self.max_index = best, best_index
+        self.count += len(values)
+        self.odd_count += len(odd)
+
+        if self.top is not None:
+            self.largest = heapq.nlargest(self.top, itertools.chain(self.largest, odd))
+        elif odd:
+            odd.sort(reverse=True)
+            self.runs.append(array('q', odd) if self.compact else odd)
+
+    def sorted_odd(self):
+        """Нечетные числа в порядке убывания (итератор)"""
+        if self.top is not None:
+            return iter(self.largest)
+        if len(self.runs) == 1:
+            return iter(self.runs[0])
+        return heapq.merge(*self.runs, reverse=True)
+
+
+class NumpyArrayScan(ArrayScan):
+    """То же на массивах NumPy: argmax и выбор через argpartition"""
+
+    def __init__(self, top=None):
+        super().__init__(top)
+        self.largest = np.empty(0, dtype=np.int64)
+
+    def feed(self, values):
+        values = np.asarray(values, dtype=np.int64)
+        if not values.size:
+            return
+        index = int(values.argmax())
+        if self.max_val is None or values[index] > self.max_val:
+            self.max_val = int(values[index])
+            self.max_index = self.count + index
+        self.count += int(values.size)
+
+        odd = values[(values & 1) != 0]
+        self.odd_count += int(odd.size)
+        if self.top is None:
+            self.runs.append(odd)
+            return
+        candidates = np.concatenate((self.largest, odd))
+        if candidates.size > self.top:
+            split = candidates.size - self.top
+            candidates = candidates[np.argpartition(candidates, split)[split:]]
+        self.largest = candidates
+
+    def sorted_odd(self):
+        if self.top is not None:
+            odd = np.sort(self.largest)
+        else:
+            odd = np.concatenate(self.runs) if self.runs else np.empty(0, dtype=np.int64)
+            # Сортировка на месте, без второй копии
+            odd.sort()
+        odd = odd[::-1]
+        for start in range(0, odd.size, OUTPUT_BATCH):
+            yield from odd[start:start + OUTPUT_BATCH].tolist()
 
-def main():
-    # Считывание массива из параметров командной строки
-    if len(sys.argv) < 2:
-        print("Ошибка: не указаны элементы массива.")
-        print("Использование: python script.py <элемент1> <элемент2> ... <элементN>")
-        sys.exit(1)
 
+# ================== ЧТЕНИЕ БОЛЬШИХ МАССИВОВ ==================
+
+def parse_text_block(block, use_numpy):
+    if use_numpy:
+        with warnings.catch_warnings():
+            # Недочитанный блок (не целое число) разбирается заново без NumPy,
+            # чтобы выдать обычную ошибку
+            warnings.simplefilter('error')
+            try:
+                return np.fromstring(block, dtype=np.int64, sep=' ')
+            except (DeprecationWarning, ValueError):
+                pass
+    return array('q', map(int, block.split()))
+
+
+def iter_binary_blocks(stream, chunk_size, use_numpy):
+    """Блоки 64-битных целых в машинном порядке байтов"""
+    chunk_size = max(chunk_size - chunk_size % INT64_SIZE, INT64_SIZE)
+    tail = b''
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        data = tail + data
+        cut = len(data) - len(data) % INT64_SIZE
+        tail = data[cut:]
+        if use_numpy:
+            yield np.frombuffer(data[:cut], dtype=np.int64)
+        else:
+            values = array('q')
+            values.frombytes(data[:cut])
+            yield values
+    if tail:
+        raise ValueError(f"размер двоичных данных не кратен {INT64_SIZE} байтам")
+
+
+def scan_input(path, binary=False, top=None, use_numpy=False, chunk_size=CHUNK_SIZE):
+    scan = NumpyArrayScan(top) if use_numpy else ArrayScan(top)
+    stream = sys.stdin.buffer if path == '-' else open_input(path)
     try:
-        arr = list(map(int, sys.argv[1:]))
-    except ValueError:
-        print("Ошибка: все элементы массива должны быть целыми числами.")
-        sys.exit(1)
+        if binary:
+            blocks = iter_binary_blocks(stream, chunk_size, use_numpy)
+        else:
+            blocks = (parse_text_block(block, use_numpy) for block in iter_chunks(stream, chunk_size))
+        for values in blocks:
+            scan.feed(values)
+    finally:
+        if stream is not sys.stdin.buffer:
+            stream.close()
+    return scan
 
-    if not arr:
-        print("Ошибка: массив не может быть пустым.")
-        sys.exit(1)
 
-    # Нахождение максимального элемента и его индекс
-    max_val = max(arr)
-    max_index = arr.index(max_val)
+def write_numbers(title, numbers, out=sys.stdout):
+    """Вывод длинной последовательности частями, без сборки одной огромной строки"""
+    out.write(title)
+    numbers = iter(numbers)
+    while True:
+        batch = list(itertools.islice(numbers, OUTPUT_BATCH))
+        if not batch:
+            break
+        out.write(' ' + ' '.join(map(str, batch)))
+    out.write('\n')
+
 
-    print(f"Максимальный элемент: {max_val}, его порядковый номер (индекс): {max_index}")
+def main():
+    parser = argparse.ArgumentParser(description='Максимальный элемент и нечетные числа массива')
+    parser.add_argument('elements', nargs='*', help='Элементы массива')
+    parser.add_argument('--file', help='Файл с массивом (.gz - сжатый, - для stdin)')
+    parser.add_argument('--binary', action='store_true', help='Файл из 64-битных целых (array("q").tofile)')
+    parser.add_argument('--top', type=int, help='Вывести только K наибольших нечетных чисел')
+    parser.add_argument('--numpy', action='store_true', help='Обработка блоков через NumPy')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Размер блока чтения, байт')
+    args = parser.parse_args()
+
+    if args.numpy and np is None:
+        parser.error('NumPy не установлен')
+    if args.top is not None and args.top < 1:
+        parser.error('--top должен быть положительным')
+    if args.chunk_size < 1:
+        parser.error('--chunk-size должен быть положительным')
+
+    if args.file:
+        if args.elements:
+            parser.error('элементы массива указываются либо в командной строке, либо в --file')
+        try:
+            scan = scan_input(args.file, args.binary, args.top, args.numpy, args.chunk_size)
+        except ValueError:
+            print("Ошибка: все элементы массива должны быть целыми числами.")
+            sys.exit(1)
+        except OverflowError:
+            print("Ошибка: элементы массива должны помещаться в 64 бита.")
+            sys.exit(1)
+        except OSError as e:
+            print(f"Ошибка: {e}")
+            sys.exit(1)
+    else:
+        # Считывание массива из параметров командной строки
+        if not args.elements:
+            print("Ошибка: не указаны элементы массива.")
+            print("Использование: python script.py <элемент1> <элемент2> ... <элементN>")
+            print("               python script.py --file <файл> [--binary] [--top K]")
+            sys.exit(1)
+
+        try:
+            arr = list(map(int, args.elements))
+        except ValueError:
+            print("Ошибка: все элементы массива должны быть целыми числами.")
+            sys.exit(1)
+
+        # Числа из командной строки могут быть любой величины - без array('q')
+        scan = ArrayScan(args.top, compact=False)
+        scan.feed(arr)
+
+    if not scan.count:
+        print("Ошибка: массив не может быть пустым.")
+        sys.exit(1)
 
-    # Фильтрация нечетных чисел и сортировка их в порядке убывания
-    odd_numbers = [x for x in arr if x % 2 != 0]
+    # Максимальный элемент и его индекс найдены при том же проходе по блокам
+    print(f"Максимальный элемент: {scan.max_val}, его порядковый номер (индекс): {scan.max_index}")
 
-    if not odd_numbers:
+    # Нечетные числа в порядке убывания: при --top выбираются без полной сортировки
+    odd_numbers_sorted = scan.sorted_odd()
+    if not scan.odd_count:
         print("В массиве нет нечетных чисел.")
+    elif args.top is not None:
+        write_numbers(f"Наибольшие нечетные числа (не более {args.top}) в порядке убывания:", odd_numbers_sorted)
     else:
-        odd_numbers_sorted = sorted(odd_numbers, reverse=True)
-        print("Нечетные числа в порядке убывания:", ' '.join(map(str, odd_numbers_sorted)))
+        write_numbers("Нечетные числа в порядке убывания:", odd_numbers_sorted)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
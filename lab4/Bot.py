@@ -4,10 +4,13 @@ import logging
 from aiogram import Bot, Dispatcher
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message
 
+from common.fsm_storage import create_fsm_storage
+from common.webhook import run_bot
+from common.metrics import setup_bot_metrics
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -27,8 +30,9 @@ if not API_TOKEN:
 
 # Инициализация бота
 bot = Bot(token=API_TOKEN)
-storage = MemoryStorage()
+storage = create_fsm_storage()
 dp = Dispatcher(storage=storage)
+setup_bot_metrics(dp)
 
 # Хранилище валют
 currencies = {}
@@ -154,7 +158,7 @@ async def process_convert_amount(message: Message, state: FSMContext):
 async def main():
     logger.info("Запуск бота...")
     try:
-        await dp.start_polling(bot)
+        await run_bot(dp, bot)
     except Exception as e:
         logger.critical(f"Ошибка при работе бота: {str(e)}")
     finally:
@@ -1,15 +1,20 @@
 import os
 import asyncio
 import logging
+from collections import OrderedDict
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.utils.keyboard import ReplyKeyboardBuilder
 import asyncpg
 
+from common.fsm_storage import create_fsm_storage
+from common.migrations import apply_migrations_async
+from common.webhook import run_bot
+from common.metrics import DB_QUERY_SECONDS, setup_bot_metrics
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -33,10 +38,25 @@ DB_CONFIG = {
     'database': os.getenv('DB_NAME')
 }
 
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Настройки пула соединений с БД
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 1))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 5))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv('DB_POOL_ACQUIRE_TIMEOUT', 5))
+
+# Список администраторов и таблица валют хранятся в памяти и обновляются по
+# уведомлениям из БД (каналы admins_changed и currencies_changed), а на случай
+# потери уведомлений - раз в CACHE_REFRESH_INTERVAL секунд
+CACHE_REFRESH_INTERVAL = float(os.getenv('CACHE_REFRESH_INTERVAL', 300))
+# Сколько пользователей помнить с уже установленным меню команд
+COMMANDS_CACHE_SIZE = int(os.getenv('COMMANDS_CACHE_SIZE', 10000))
+
 # Инициализация бота
 bot = Bot(token=API_TOKEN)
-storage = MemoryStorage()
+storage = create_fsm_storage(DB_CONFIG)
 dp = Dispatcher(storage=storage)
+setup_bot_metrics(dp)
 
 # Машина состояний
 class CurrencyStates(StatesGroup):
@@ -48,53 +68,186 @@ class CurrencyStates(StatesGroup):
     waiting_for_currency_to_update = State()
     waiting_for_new_currency_rate = State()
 
+# Общий пул соединений создается в init_db()
+db_pool = None
+
+def acquire_db_connection():
+    """Получение соединения из общего пула (используется как async with)"""
+    return db_pool.acquire(timeout=DB_POOL_ACQUIRE_TIMEOUT)
+
 async def create_db_connection():
+    """Отдельное соединение вне пула (для LISTEN)"""
     return await asyncpg.connect(**DB_CONFIG)
 
 async def init_db():
-    conn = None
+    global db_pool
     try:
-        conn = await create_db_connection()
-        await conn.execute("SELECT 1 FROM currencies LIMIT 1")
-        await conn.execute("SELECT 1 FROM admins LIMIT 1")
+        db_pool = await asyncpg.create_pool(
+            **DB_CONFIG,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            timeout=DB_POOL_ACQUIRE_TIMEOUT
+        )
+        async with acquire_db_connection() as conn:
+            await conn.execute("SELECT 1 FROM currencies LIMIT 1")
+            await conn.execute("SELECT 1 FROM admins LIMIT 1")
+            applied = await apply_migrations_async(conn, 'lab5', MIGRATIONS_DIR)
+            if applied:
+                logger.info(f"Применены миграции: {', '.join(applied)}")
+            await load_admins(conn)
+            await load_currencies(conn)
         logger.info("Подключение к базе данных успешно")
     except Exception as e:
         logger.error(f"Ошибка при проверке таблиц: {str(e)}")
         exit(1)
-    finally:
-        if conn:
-            await conn.close()
 
-async def is_admin(chat_id: str) -> bool:
-    conn = None
+async def close_db():
+    if db_pool:
+        await db_pool.close()
+
+# ================== АДМИНИСТРАТОРЫ ==================
+
+admin_ids = set()
+# Отдельное соединение, на котором бот слушает уведомления об изменениях
+db_listener_conn = None
+# user_id -> был ли пользователь админом, когда ему ставили меню (LRU)
+user_commands_cache = OrderedDict()
+
+async def load_admins(conn):
+    global admin_ids
+    with DB_QUERY_SECONDS.time(query='load_admins'):
+        records = await conn.fetch("SELECT chat_id FROM admins")
+    new_admin_ids = {str(record['chat_id']) for record in records}
+    # Меню команд пользователей, у которых изменились права, нужно поставить заново
+    for chat_id in admin_ids ^ new_admin_ids:
+        user_commands_cache.pop(int(chat_id), None)
+    admin_ids = new_admin_ids
+
+async def refresh_admins():
     try:
-        conn = await create_db_connection()
-        return await conn.fetchval("SELECT 1 FROM admins WHERE chat_id = $1", str(chat_id)) is not None
+        async with acquire_db_connection() as conn:
+            await load_admins(conn)
     except Exception as e:
-        logger.error(f"Ошибка при проверке администратора: {str(e)}")
-        return False
-    finally:
-        if conn:
-            await conn.close()
+        logger.error(f"Ошибка при обновлении списка администраторов: {str(e)}")
+
+# Ссылки на фоновые задачи, чтобы их не удалил сборщик мусора
+background_tasks = set()
+
+def run_in_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+def on_admins_changed(connection, pid, channel, payload):
+    run_in_background(refresh_admins())
 
-async def get_currencies():
-    conn = None
+def on_currencies_changed(connection, pid, channel, payload):
+    if payload == '*':
+        run_in_background(refresh_currencies())
+    else:
+        run_in_background(refresh_currency(payload, mark_currency_changed(payload)))
+
+async def start_db_listener():
+    global db_listener_conn
     try:
-        conn = await create_db_connection()
+        db_listener_conn = await create_db_connection()
+        await db_listener_conn.add_listener('admins_changed', on_admins_changed)
+        await db_listener_conn.add_listener('currencies_changed', on_currencies_changed)
+    except Exception as e:
+        logger.error(f"Не удалось подписаться на изменения в БД: {str(e)}")
+        if db_listener_conn and not db_listener_conn.is_closed():
+            await db_listener_conn.close()
+        db_listener_conn = None
+
+async def refresh_caches_periodically():
+    while True:
+        await asyncio.sleep(CACHE_REFRESH_INTERVAL)
+        await refresh_admins()
+        await refresh_currencies()
+        # Переподключение слушателя, если соединение было потеряно
+        if db_listener_conn is None or db_listener_conn.is_closed():
+            await start_db_listener()
+
+async def stop_db_listener():
+    if db_listener_conn and not db_listener_conn.is_closed():
+        await db_listener_conn.close()
+
+def is_admin(chat_id: str) -> bool:
+    return str(chat_id) in admin_ids
+
+# ================== ВАЛЮТЫ ==================
+
+# Таблица currencies в памяти: имя -> курс; меняется вместе с записью в БД
+currencies_map = {}
+# Номер последнего изменения каждой валюты (запись этим ботом или уведомление).
+# Чтение из БД, начатое до изменения, не перезаписывает более новое значение
+currency_change_seq = 0
+currency_changes = {}
+# Номер изменения, на момент которого прочитана последняя полная таблица
+currencies_loaded_seq = 0
+
+def mark_currency_changed(name):
+    global currency_change_seq
+    currency_change_seq += 1
+    currency_changes[name] = currency_change_seq
+    return currency_change_seq
+
+async def load_currencies(conn):
+    global currencies_map, currencies_loaded_seq
+    snapshot_seq = currency_change_seq
+    with DB_QUERY_SECONDS.time(query='load_currencies'):
         records = await conn.fetch("SELECT currency_name, rate FROM currencies")
-        return {record['currency_name']: record['rate'] for record in records}
+    # Более позднее чтение уже успело обновить кэш
+    if snapshot_seq < currencies_loaded_seq:
+        return
+    currencies_loaded_seq = snapshot_seq
+    new_map = {record['currency_name']: record['rate'] for record in records}
+    # Валюты, измененные во время чтения, остаются в том виде, в каком они в кэше
+    for name, seq in list(currency_changes.items()):
+        if seq <= snapshot_seq:
+            del currency_changes[name]
+        elif name in currencies_map:
+            new_map[name] = currencies_map[name]
+        else:
+            new_map.pop(name, None)
+    currencies_map = new_map
+
+async def refresh_currencies():
+    try:
+        async with acquire_db_connection() as conn:
+            await load_currencies(conn)
     except Exception as e:
         logger.error(f"Ошибка при получении валют: {str(e)}")
-        return {}
-    finally:
-        if conn:
-            await conn.close()
+
+async def refresh_currency(name, seq):
+    """Перечитывание одной валюты после уведомления с номером изменения seq"""
+    try:
+        async with acquire_db_connection() as conn:
+            with DB_QUERY_SECONDS.time(query='load_currency'):
+                rate = await conn.fetchval("SELECT rate FROM currencies WHERE currency_name = $1", name)
+    except Exception as e:
+        logger.error(f"Ошибка при получении валюты {name}: {str(e)}")
+        return
+    # Пока шел запрос, пришло более новое изменение - его обработает свой запрос
+    if currency_changes.get(name) != seq:
+        return
+    if rate is None:
+        currencies_map.pop(name, None)
+    else:
+        currencies_map[name] = rate
+
+def get_currencies():
+    return currencies_map
 
 async def add_currency(name: str, rate: float) -> bool:
-    conn = None
     try:
-        conn = await create_db_connection()
-        await conn.execute("INSERT INTO currencies (currency_name, rate) VALUES ($1, $2)", name, rate)
+        async with acquire_db_connection() as conn:
+            with DB_QUERY_SECONDS.time(query='add_currency'):
+                stored_rate = await conn.fetchval(
+                    "INSERT INTO currencies (currency_name, rate) VALUES ($1, $2) RETURNING rate", name, rate
+                )
+        mark_currency_changed(name)
+        currencies_map[name] = stored_rate
         return True
     except asyncpg.UniqueViolationError:
         logger.warning(f"Валюта {name} уже существует")
@@ -102,33 +255,35 @@ async def add_currency(name: str, rate: float) -> bool:
     except Exception as e:
         logger.error(f"Ошибка при добавлении валюты: {str(e)}")
         return False
-    finally:
-        if conn:
-            await conn.close()
 
 async def delete_currency(name: str) -> bool:
-    conn = None
     try:
-        conn = await create_db_connection()
-        return await conn.execute("DELETE FROM currencies WHERE currency_name = $1", name) != "DELETE 0"
+        async with acquire_db_connection() as conn:
+            with DB_QUERY_SECONDS.time(query='delete_currency'):
+                deleted = await conn.execute("DELETE FROM currencies WHERE currency_name = $1", name) != "DELETE 0"
+        mark_currency_changed(name)
+        currencies_map.pop(name, None)
+        return deleted
     except Exception as e:
         logger.error(f"Ошибка при удалении валюты: {str(e)}")
         return False
-    finally:
-        if conn:
-            await conn.close()
 
 async def update_currency_rate(name: str, new_rate: float) -> bool:
-    conn = None
     try:
-        conn = await create_db_connection()
-        return await conn.execute("UPDATE currencies SET rate = $1 WHERE currency_name = $2", new_rate, name) != "UPDATE 0"
+        async with acquire_db_connection() as conn:
+            with DB_QUERY_SECONDS.time(query='update_currency'):
+                stored_rate = await conn.fetchval(
+                    "UPDATE currencies SET rate = $1 WHERE currency_name = $2 RETURNING rate", new_rate, name
+                )
+        mark_currency_changed(name)
+        if stored_rate is None:
+            currencies_map.pop(name, None)
+            return False
+        currencies_map[name] = stored_rate
+        return True
     except Exception as e:
         logger.error(f"Ошибка при обновлении курса: {str(e)}")
         return False
-    finally:
-        if conn:
-            await conn.close()
 
 def get_manage_keyboard():
     builder = ReplyKeyboardBuilder()
@@ -141,24 +296,33 @@ def get_manage_keyboard():
     return builder.as_markup(resize_keyboard=True)
 
 async def set_commands_for_user(user_id: int):
+    admin = is_admin(str(user_id))
+    if user_commands_cache.get(user_id) == admin:
+        user_commands_cache.move_to_end(user_id)
+        return
+
     commands = [
         types.BotCommand(command="start", description="Запустить бота"),
         types.BotCommand(command="get_currencies", description="Список всех валют"),
         types.BotCommand(command="convert", description="Конвертировать в рубли"),
     ]
-    if await is_admin(str(user_id)):
+    if admin:
         commands.extend([
             types.BotCommand(command="manage_currency", description="Управление валютами (админ)"),
             types.BotCommand(command="dev_menu", description="Меню разработчика (админ)")
         ])
-    await bot.set_my_commands(commands)
+    await bot.set_my_commands(commands, scope=types.BotCommandScopeChat(chat_id=user_id))
+
+    user_commands_cache[user_id] = admin
+    if len(user_commands_cache) > COMMANDS_CACHE_SIZE:
+        user_commands_cache.popitem(last=False)
 
 # ================== ОСНОВНЫЕ КОМАНДЫ ==================
 
 @dp.message(Command('start'))
 async def cmd_start(message: Message):
     await set_commands_for_user(message.from_user.id)
-    if await is_admin(str(message.from_user.id)):
+    if is_admin(str(message.from_user.id)):
         await message.answer(
             "💰 Бот для работы с валютами (админ-режим):\n"
             "/get_currencies - список всех валют\n"
@@ -175,7 +339,7 @@ async def cmd_start(message: Message):
 @dp.message(Command('get_currencies'))
 async def cmd_get_currencies(message: Message):
     try:
-        currencies = await get_currencies()
+        currencies = get_currencies()
         if not currencies:
             await message.answer("ℹ️ В базе нет сохранённых валют")
             return
@@ -188,7 +352,7 @@ async def cmd_get_currencies(message: Message):
 @dp.message(Command('convert'))
 async def cmd_convert(message: Message, state: FSMContext):
     try:
-        currencies = await get_currencies()
+        currencies = get_currencies()
         if not currencies:
             await message.answer("ℹ️ Нет доступных валют для конвертации")
             return
@@ -201,7 +365,7 @@ async def cmd_convert(message: Message, state: FSMContext):
 @dp.message(CurrencyStates.waiting_for_convert_currency)
 async def process_convert_currency(message: Message, state: FSMContext):
     currency = message.text.strip().upper()
-    currencies = await get_currencies()
+    currencies = get_currencies()
     if currency not in currencies:
         await message.answer(f"❌ Валюта '{currency}' не найдена.\nДоступные валюты: {', '.join(currencies.keys())}")
         return
@@ -218,7 +382,7 @@ async def process_convert_amount(message: Message, state: FSMContext):
             return
         data = await state.get_data()
         currency = data['currency']
-        rate = (await get_currencies())[currency]
+        rate = get_currencies()[currency]
         result = amount * float(rate)
         await message.answer(f"💱 Результат конвертации:\n{amount:.2f} {currency} = {result:.2f} RUB\nКурс: 1 {currency} = {rate} RUB")
     except ValueError:
@@ -233,14 +397,14 @@ async def process_convert_amount(message: Message, state: FSMContext):
 
 @dp.message(Command('manage_currency'))
 async def cmd_manage_currency(message: Message, state: FSMContext):
-    if not await is_admin(str(message.from_user.id)):
+    if not is_admin(str(message.from_user.id)):
         await message.answer("Нет доступа к команде")
         return
     await message.answer("Управление валютами:", reply_markup=get_manage_keyboard())
 
 @dp.message(lambda message: message.text == "Добавить валюту")
 async def add_currency_handler(message: Message, state: FSMContext):
-    if not await is_admin(str(message.from_user.id)):
+    if not is_admin(str(message.from_user.id)):
         return
     await message.answer("Введите название валюты:", reply_markup=types.ReplyKeyboardRemove())
     await state.set_state(CurrencyStates.waiting_for_currency_name)
@@ -248,7 +412,7 @@ async def add_currency_handler(message: Message, state: FSMContext):
 @dp.message(CurrencyStates.waiting_for_currency_name)
 async def process_currency_name(message: Message, state: FSMContext):
     currency = message.text.upper()
-    if currency in await get_currencies():
+    if currency in get_currencies():
         await message.answer("Данная валюта уже существует")
         await state.clear()
         return
@@ -273,7 +437,7 @@ async def process_currency_rate(message: Message, state: FSMContext):
 
 @dp.message(lambda message: message.text == "Удалить валюту")
 async def delete_currency_handler(message: Message, state: FSMContext):
-    if not await is_admin(str(message.from_user.id)):
+    if not is_admin(str(message.from_user.id)):
         return
     await message.answer("Введите название валюты для удаления:", reply_markup=types.ReplyKeyboardRemove())
     await state.set_state(CurrencyStates.waiting_for_currency_to_delete)
@@ -287,7 +451,7 @@ async def process_currency_to_delete(message: Message, state: FSMContext):
 
 @dp.message(lambda message: message.text == "Изменить курс валюты")
 async def update_currency_handler(message: Message, state: FSMContext):
-    if not await is_admin(str(message.from_user.id)):
+    if not is_admin(str(message.from_user.id)):
         return
     await message.answer("Введите название валюты для изменения:", reply_markup=types.ReplyKeyboardRemove())
     await state.set_state(CurrencyStates.waiting_for_currency_to_update)
@@ -325,14 +489,19 @@ async def cancel_handler(message: Message, state: FSMContext):
 
 async def main():
     await init_db()
+    await start_db_listener()
+    cache_refresh_task = asyncio.create_task(refresh_caches_periodically())
     await bot.set_my_commands([
         types.BotCommand(command="start", description="Запустить бота"),
         types.BotCommand(command="get_currencies", description="Список всех валют"),
         types.BotCommand(command="convert", description="Конвертировать в рубли"),
     ])
     try:
-        await dp.start_polling(bot)
+        await run_bot(dp, bot)
     finally:
+        cache_refresh_task.cancel()
+        await stop_db_listener()
+        await close_db()
         await bot.session.close()
 
 if __name__ == '__main__':
@@ -0,0 +1,12 @@
+-- Уведомление ботов об изменении списка администраторов (канал admins_changed)
+CREATE OR REPLACE FUNCTION notify_admins_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('admins_changed', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS admins_changed ON admins;
+CREATE TRIGGER admins_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON admins
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_admins_changed();
@@ -0,0 +1,27 @@
+-- Уведомление ботов об изменении валют (канал currencies_changed).
+-- В payload - имя измененной валюты, '*' - после TRUNCATE
+CREATE OR REPLACE FUNCTION notify_currencies_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('currencies_changed', '*');
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('currencies_changed', OLD.currency_name);
+    ELSE
+        IF TG_OP = 'UPDATE' AND OLD.currency_name <> NEW.currency_name THEN
+            PERFORM pg_notify('currencies_changed', OLD.currency_name);
+        END IF;
+        PERFORM pg_notify('currencies_changed', NEW.currency_name);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS currencies_changed ON currencies;
+CREATE TRIGGER currencies_changed
+    AFTER INSERT OR UPDATE OR DELETE ON currencies
+    FOR EACH ROW EXECUTE FUNCTION notify_currencies_changed();
+
+DROP TRIGGER IF EXISTS currencies_truncated ON currencies;
+CREATE TRIGGER currencies_truncated
+    AFTER TRUNCATE ON currencies
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_currencies_changed();
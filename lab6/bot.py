@@ -1,22 +1,60 @@
 import os
+import time
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.utils.keyboard import ReplyKeyboardBuilder
-import requests
 from dotenv import load_dotenv
+from http_client import ServiceClient, ServiceError, create_session
+
+from common.webhook import run_bot
+from common.metrics import setup_bot_metrics
 
 load_dotenv()
 
 # Конфигурация
 BOT_TOKEN = os.getenv("TELEGRAM_TOKEN")
-CURRENCY_SERVICE_URL = "http://localhost:5001"
-DATA_SERVICE_URL = "http://localhost:5002"
+CURRENCY_SERVICE_URL = os.getenv("CURRENCY_SERVICE_URL", "http://localhost:5001")
+DATA_SERVICE_URL = os.getenv("DATA_SERVICE_URL", "http://localhost:5002")
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 5))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", 2))
+SERVICE_UNAVAILABLE_TEXT = "Сервис временно недоступен, попробуйте позже"
+
+# Асинхронные клиенты сервисов; общая HTTP-сессия создается в main()
+currency_service = ServiceClient(
+    CURRENCY_SERVICE_URL, timeout=HTTP_TIMEOUT, retries=HTTP_RETRIES, name='currency_manager'
+)
+data_service = ServiceClient(DATA_SERVICE_URL, timeout=HTTP_TIMEOUT, retries=HTTP_RETRIES, name='data_manager')
+
+# Локальный кэш существующих валют: имя в нижнем регистре -> время истечения.
+# Хранятся только найденные валюты; их могут удалить через другого бота, поэтому TTL
+KNOWN_CURRENCY_TTL = float(os.getenv("KNOWN_CURRENCY_TTL", 300))
+known_currencies = {}
+
+
+def remember_currency(currency_name):
+    known_currencies[currency_name.lower()] = time.monotonic() + KNOWN_CURRENCY_TTL
+
+
+def forget_currency(currency_name):
+    known_currencies.pop(currency_name.lower(), None)
+
+
+async def currency_exists(currency_name):
+    """Проверка без учета регистра: сначала локальный кэш, затем поиск по индексу"""
+    if known_currencies.get(currency_name.lower(), 0) > time.monotonic():
+        return True
+    status, _ = await data_service.get("/currencies/lookup", params={"currency": currency_name})
+    if status == 200:
+        remember_currency(currency_name)
+        return True
+    return False
 
 # Инициализация бота и диспетчера
 bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher()
+setup_bot_metrics(dp)
 
 
 # Состояния FSM
@@ -82,17 +120,19 @@ async def process_currency_name(message: types.Message, state: FSMContext):
 
     if data.get("action") == "add":
         # Проверка существования валюты
-        response = requests.get(f"{DATA_SERVICE_URL}/currencies")
-        if response.status_code == 200:
-            currencies = response.json().get("currencies", [])
-            for currency in currencies:
-                if currency["currency_name"].lower() == message.text.lower():
-                    await message.answer(
-                        "Данная валюта уже существует",
-                        reply_markup=get_manage_kb()
-                    )
-                    await state.clear()
-                    return
+        try:
+            exists = await currency_exists(message.text)
+        except ServiceError:
+            await message.answer(SERVICE_UNAVAILABLE_TEXT, reply_markup=get_manage_kb())
+            await state.clear()
+            return
+        if exists:
+            await message.answer(
+                "Данная валюта уже существует",
+                reply_markup=get_manage_kb()
+            )
+            await state.clear()
+            return
 
     await state.update_data(currency_name=message.text)
     await message.answer("Введите курс к рублю:")
@@ -108,21 +148,22 @@ async def process_currency_rate(message: types.Message, state: FSMContext):
         action = data["action"]
 
         if action == "add":
-            response = requests.post(
-                f"{CURRENCY_SERVICE_URL}/load",
+            status, _ = await currency_service.post(
+                "/load",
                 json={"currency_name": currency_name, "rate": rate},
             )
-            if response.status_code == 200:
+            if status == 200:
+                remember_currency(currency_name)
                 await message.answer(
                     f"Валюта: {currency_name} успешно добавлена",
                     reply_markup=get_manage_kb()
                 )
         elif action == "update":
-            response = requests.post(
-                f"{CURRENCY_SERVICE_URL}/update_currency",
+            status, _ = await currency_service.post(
+                "/update_currency",
                 json={"currency_name": currency_name, "new_rate": rate},
             )
-            if response.status_code == 200:
+            if status == 200:
                 await message.answer(
                     f"Курс валюты {currency_name} успешно обновлен",
                     reply_markup=get_manage_kb()
@@ -131,6 +172,9 @@ async def process_currency_rate(message: types.Message, state: FSMContext):
         await state.clear()
     except ValueError:
         await message.answer("Пожалуйста, введите число:")
+    except ServiceError:
+        await message.answer(SERVICE_UNAVAILABLE_TEXT, reply_markup=get_manage_kb())
+        await state.clear()
 
 
 # Удаление валюты
@@ -146,12 +190,18 @@ async def delete_currency_start(message: types.Message, state: FSMContext):
 @dp.message(CurrencyStates.waiting_for_delete_currency, F.text)
 async def process_delete_currency(message: types.Message, state: FSMContext):
     currency_name = message.text
-    response = requests.post(
-        f"{CURRENCY_SERVICE_URL}/delete",
-        json={"currency_name": currency_name},
-    )
+    try:
+        status, _ = await currency_service.post(
+            "/delete",
+            json={"currency_name": currency_name},
+        )
+    except ServiceError:
+        await message.answer(SERVICE_UNAVAILABLE_TEXT, reply_markup=get_manage_kb())
+        await state.clear()
+        return
 
-    if response.status_code == 200:
+    if status == 200:
+        forget_currency(currency_name)
         await message.answer(
             f"Валюта {currency_name} успешно удалена",
             reply_markup=get_manage_kb()
@@ -176,9 +226,14 @@ async def update_currency_start(message: types.Message, state: FSMContext):
 # Получение списка валют
 @dp.message(Command("get_currencies"))
 async def cmd_get_currencies(message: types.Message):
-    response = requests.get(f"{DATA_SERVICE_URL}/currencies")
-    if response.status_code == 200:
-        currencies = response.json().get("currencies", [])
+    try:
+        status, result = await data_service.get("/currencies")
+    except ServiceError:
+        await message.answer(SERVICE_UNAVAILABLE_TEXT, reply_markup=get_main_kb())
+        return
+
+    if status == 200:
+        currencies = result.get("currencies", [])
         if currencies:
             message_text = "Список валют:\n" + "\n".join(
                 [f"{c['currency_name']}: {c['rate']} RUB" for c in currencies]
@@ -215,13 +270,12 @@ async def process_convert_amount(message: types.Message, state: FSMContext):
         data = await state.get_data()
         currency = data["currency"]
 
-        response = requests.get(
-            f"{DATA_SERVICE_URL}/convert",
+        status, result = await data_service.get(
+            "/convert",
             params={"currency": currency, "amount": amount},
         )
 
-        if response.status_code == 200:
-            result = response.json()
+        if status == 200:
             await message.answer(
                 f"{amount} {currency} = {result['converted_amount']} RUB",
                 reply_markup=get_main_kb()
@@ -235,10 +289,19 @@ async def process_convert_amount(message: types.Message, state: FSMContext):
         await state.clear()
     except ValueError:
         await message.answer("Пожалуйста, введите число:")
+    except ServiceError:
+        await message.answer(SERVICE_UNAVAILABLE_TEXT, reply_markup=get_main_kb())
+        await state.clear()
 
 
 async def main():
-    await dp.start_polling(bot)
+    session = create_session()
+    currency_service.session = session
+    data_service.session = session
+    try:
+        await run_bot(dp, bot)
+    finally:
+        await session.close()
 
 
 if __name__ == "__main__":
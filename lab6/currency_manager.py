@@ -1,29 +1,32 @@
-from flask import Flask, request, jsonify
-import psycopg2
 import os
-from dotenv import load_dotenv
+from flask import Flask, request, jsonify
+# Подключение к БД (пул соединений) и конфигурация из .env - в currency_repository
+import currency_repository
 
-# Загружаем переменные окружения из файла .env
-load_dotenv()
+from common.metrics import CallbackMetric, instrument_flask
 
 app = Flask(__name__)
+instrument_flask(app)
 
-# Конфигурация подключения к БД через переменные окружения
-DB_CONFIG = {
-    'host': os.environ['DB_HOST'],
-    'port': os.environ['DB_PORT'],
-    'user': os.environ['DB_USER'],
-    'password': os.environ['DB_PASSWORD'],
-    'database': os.environ['DB_NAME']
-}
+# Метрики пула соединений читаются из его счетчиков при запросе /metrics
+CallbackMetric(
+    'db_pool_connections_in_use', 'Занятые соединения пула БД',
+    lambda: currency_repository.pool_stats()['in_use']
+)
+CallbackMetric(
+    'db_pool_timeouts_total', 'Ожидания соединения, завершившиеся по таймауту',
+    lambda: currency_repository.pool_stats()['timeouts_total'], kind='counter'
+)
 
+# Максимум валют в одном пакетном запросе
+BULK_MAX_ITEMS = int(os.getenv('BULK_MAX_ITEMS', 10000))
 
-def get_db_connection():
-    return psycopg2.connect(**DB_CONFIG)
 
 @app.after_request
 def add_charset(response):
-    response.headers["Content-Type"] = "application/json; charset=utf-8"
+    # Только для JSON: /metrics отдает text/plain в формате Prometheus
+    if response.mimetype == 'application/json':
+        response.headers["Content-Type"] = "application/json; charset=utf-8"
     return response
 
 
@@ -37,20 +40,8 @@ def load_currency():
         return jsonify({'error': 'Необходимо указать currency_name и rate'}), 400
 
     try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT 1 FROM currencies WHERE currency_name = %s",
-                    (currency_name,)
-                )
-                if cur.fetchone():
-                    return jsonify({'error': 'Валюта уже существует'}), 400
-
-                cur.execute(
-                    "INSERT INTO currencies (currency_name, rate) VALUES (%s, %s)",
-                    (currency_name, rate)
-                )
-                conn.commit()
+        if not currency_repository.add_currency(currency_name, rate):
+            return jsonify({'error': 'Валюта уже существует'}), 400
         return jsonify({'message': 'Валюта успешно добавлена'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -66,20 +57,8 @@ def update_currency():
         return jsonify({'error': 'Необходимо указать currency_name и new_rate'}), 400
 
     try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT 1 FROM currencies WHERE currency_name = %s",
-                    (currency_name,)
-                )
-                if not cur.fetchone():
-                    return jsonify({'error': 'Валюта не найдена'}), 404
-
-                cur.execute(
-                    "UPDATE currencies SET rate = %s WHERE currency_name = %s",
-                    (new_rate, currency_name)
-                )
-                conn.commit()
+        if not currency_repository.update_currency(currency_name, new_rate):
+            return jsonify({'error': 'Валюта не найдена'}), 404
         return jsonify({'message': 'Курс валюты успешно обновлен'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -94,24 +73,98 @@ def delete_currency():
         return jsonify({'error': 'Необходимо указать currency_name'}), 400
 
     try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT 1 FROM currencies WHERE currency_name = %s",
-                    (currency_name,)
-                )
-                if not cur.fetchone():
-                    return jsonify({'error': 'Валюта не найдена'}), 404
-
-                cur.execute(
-                    "DELETE FROM currencies WHERE currency_name = %s",
-                    (currency_name,)
-                )
-                conn.commit()
+        if not currency_repository.delete_currency(currency_name):
+            return jsonify({'error': 'Валюта не найдена'}), 404
         return jsonify({'message': 'Валюта успешно удалена'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def get_bulk_items(data, key):
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({'error': f'Необходимо передать непустой список {key}'}), 400)
+    if len(items) > BULK_MAX_ITEMS:
+        return None, (jsonify({'error': f'Не более {BULK_MAX_ITEMS} валют за запрос'}), 400)
+    return items, None
+
+
+def is_valid_rate(rate):
+    return isinstance(rate, (int, float)) and not isinstance(rate, bool) and rate > 0
+
+
+@app.route('/load_bulk', methods=['POST'])
+def load_currencies_bulk():
+    """Пакетное добавление/обновление курсов (upsert) в одной транзакции"""
+    items, error = get_bulk_items(request.get_json(silent=True), 'currencies')
+    if error:
+        return error
+
+    results = []
+    rows = {}
+    for index, item in enumerate(items):
+        currency_name = item.get('currency_name') if isinstance(item, dict) else None
+        rate = item.get('rate') if isinstance(item, dict) else None
+        if not isinstance(currency_name, str) or not currency_name or not is_valid_rate(rate):
+            results.append({'currency_name': currency_name, 'status': 'invalid'})
+            continue
+        # При повторе имени (без учета регистра) применяется последнее значение
+        key = currency_name.lower()
+        if key in rows:
+            results[rows[key][0]]['status'] = 'duplicate'
+        rows[key] = (index, currency_name, rate)
+        results.append({'currency_name': currency_name, 'status': None})
+
+    try:
+        outcome = currency_repository.upsert_currencies(
+            [(name, rate) for _, name, rate in rows.values()]
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    for key, (index, _, _) in rows.items():
+        results[index]['status'] = outcome.get(key, 'invalid')
+
+    summary = {status: 0 for status in ('inserted', 'updated', 'duplicate', 'invalid')}
+    for result in results:
+        summary[result['status']] += 1
+    return jsonify({'results': results, **summary}), 200
+
+
+@app.route('/delete_bulk', methods=['POST'])
+def delete_currencies_bulk():
+    """Пакетное удаление валют одним запросом"""
+    items, error = get_bulk_items(request.get_json(silent=True), 'currency_names')
+    if error:
+        return error
+
+    names = [name for name in items if isinstance(name, str) and name]
+    try:
+        deleted = currency_repository.delete_currencies(set(names))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    results = []
+    for name in items:
+        if not isinstance(name, str) or not name:
+            status = 'invalid'
+        elif name in deleted:
+            status = 'deleted'
+        else:
+            status = 'not_found'
+        results.append({'currency_name': name, 'status': status})
+
+    summary = {status: 0 for status in ('deleted', 'not_found', 'invalid')}
+    for result in results:
+        summary[result['status']] += 1
+    return jsonify({'results': results, **summary}), 200
+
+
+@app.route('/pool_stats', methods=['GET'])
+def get_pool_stats():
+    return jsonify(currency_repository.pool_stats()), 200
+
+
 if __name__ == '__main__':
+    currency_repository.apply_migrations()
     app.run(port=5001, debug=True)
\ No newline at end of file
@@ -0,0 +1,328 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+import psycopg2.pool
+from dotenv import load_dotenv
+
+from common import migrations
+from common.metrics import DB_QUERY_SECONDS
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.environ['DB_HOST'],
+    'port': os.environ['DB_PORT'],
+    'user': os.environ['DB_USER'],
+    'password': os.environ['DB_PASSWORD'],
+    'database': os.environ['DB_NAME']
+}
+
+# Настройки пула соединений
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 5))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Канал LISTEN/NOTIFY, в который пишутся имена измененных валют ('*' - все)
+NOTIFY_CHANNEL = 'currency_changed'
+
+# Подготовленные запросы, которые создаются на каждом соединении один раз
+PREPARED_STATEMENTS = {
+    'get_rate': "SELECT rate FROM currencies WHERE currency_name = $1",
+    'find_currency': "SELECT currency_name, rate FROM currencies WHERE lower(currency_name) = lower($1)",
+}
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """Соединение, которое помнит, подготовлены ли на нем запросы"""
+    prepared = False
+    overflow = False
+
+    def prepare_statements(self):
+        with self.cursor() as cur:
+            for name, query in PREPARED_STATEMENTS.items():
+                cur.execute(f"PREPARE {name} AS {query}")
+        self.commit()
+        self.prepared = True
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений с ограниченным переполнением.
+
+    Постоянно держится до max_size соединений; при их нехватке открывается
+    до max_overflow временных соединений, которые закрываются после
+    возврата. Если заняты и они, поток ждет свободное соединение не дольше
+    timeout секунд.
+    """
+
+    def __init__(self, min_size, max_size, max_overflow, timeout, **db_config):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self._db_config = db_config
+        self._pool = psycopg2.pool.ThreadedConnectionPool(
+            min_size, max_size, connection_factory=PreparedConnection, **db_config
+        )
+        self._slots = threading.BoundedSemaphore(max_size + max_overflow)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._overflow_in_use = 0
+        self._stats = {
+            'acquired': 0,
+            'overflow_opened': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_time_total': 0.0,
+        }
+
+    def getconn(self):
+        started = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['waits'] += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self._stats['timeouts'] += 1
+                raise PoolTimeoutError("Нет свободных соединений с базой данных")
+
+        try:
+            try:
+                conn = self._pool.getconn()
+            except psycopg2.pool.PoolError:
+                conn = psycopg2.connect(connection_factory=PreparedConnection, **self._db_config)
+                conn.overflow = True
+            if not conn.prepared:
+                conn.prepare_statements()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._stats['acquired'] += 1
+            self._stats['wait_time_total'] += time.monotonic() - started
+            if conn.overflow:
+                self._overflow_in_use += 1
+                self._stats['overflow_opened'] += 1
+        return conn
+
+    def putconn(self, conn):
+        try:
+            if conn.overflow:
+                conn.close()
+            else:
+                self._pool.putconn(conn, close=conn.closed != 0)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                if conn.overflow:
+                    self._overflow_in_use -= 1
+            self._slots.release()
+
+    def stats(self):
+        """Метрики заполненности пула"""
+        with self._lock:
+            in_use = self._in_use
+            stats = dict(self._stats)
+            overflow_in_use = self._overflow_in_use
+        capacity = self.max_size + self.max_overflow
+        return {
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'max_overflow': self.max_overflow,
+            'timeout': self.timeout,
+            'in_use': in_use,
+            'overflow_in_use': overflow_in_use,
+            'saturation': round(in_use / capacity, 3) if capacity else 0.0,
+            'acquired_total': stats['acquired'],
+            'overflow_opened_total': stats['overflow_opened'],
+            'waits_total': stats['waits'],
+            'timeouts_total': stats['timeouts'],
+            'avg_acquire_ms': round(stats['wait_time_total'] / stats['acquired'] * 1000, 3)
+            if stats['acquired'] else 0.0,
+        }
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+                    **DB_CONFIG
+                )
+    return _pool
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+@contextmanager
+def get_db_connection():
+    """Соединение из пула: commit при успехе, rollback при ошибке"""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+def apply_migrations():
+    """Применение еще не примененных миграций из migrations/; возвращает их имена"""
+    with get_db_connection() as conn:
+        return migrations.apply_migrations(conn, 'lab6', MIGRATIONS_DIR)
+
+
+# ================== ЗАПРОСЫ ==================
+
+def notify_changed(cur, currency_name='*'):
+    """Уведомление читателей об изменении; доставляется при commit"""
+    cur.execute("SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, currency_name))
+
+
+def get_rate(currency_name):
+    """Курс валюты (Decimal) или None, если валюта не найдена"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur, DB_QUERY_SECONDS.time(query='get_rate'):
+            cur.execute("EXECUTE get_rate (%s)", (currency_name,))
+            result = cur.fetchone()
+    return result[0] if result else None
+
+
+def find_currency(currency_name):
+    """Поиск валюты без учета регистра: (имя, курс) или None"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur, DB_QUERY_SECONDS.time(query='find_currency'):
+            cur.execute("EXECUTE find_currency (%s)", (currency_name,))
+            result = cur.fetchone()
+    return (result[0], float(result[1])) if result else None
+
+
+def get_rates(currency_names):
+    """Курсы сразу нескольких валют одним запросом: {имя: Decimal}"""
+    if not currency_names:
+        return {}
+    with get_db_connection() as conn:
+        with conn.cursor() as cur, DB_QUERY_SECONDS.time(query='get_rates'):
+            cur.execute(
+                "SELECT currency_name, rate FROM currencies WHERE currency_name = ANY(%s)",
+                (list(currency_names),)
+            )
+            return dict(cur.fetchall())
+
+
+def get_all_currencies():
+    with get_db_connection() as conn:
+        with conn.cursor() as cur, DB_QUERY_SECONDS.time(query='get_all_currencies'):
+            cur.execute("SELECT currency_name, rate FROM currencies")
+            return [(name, float(rate)) for name, rate in cur.fetchall()]
+
+
+def add_currency(currency_name, rate):
+    """Добавление валюты. Возвращает False, если валюта уже существует (без учета регистра)"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur, DB_QUERY_SECONDS.time(query='add_currency'):
+            cur.execute("EXECUTE find_currency (%s)", (currency_name,))
+            if cur.fetchone():
+                return False
+            cur.execute(
+                "INSERT INTO currencies (currency_name, rate) VALUES (%s, %s)",
+                (currency_name, rate)
+            )
+            notify_changed(cur, currency_name)
+    return True
+
+
+def update_currency(currency_name, new_rate):
+    """Обновление курса. Возвращает False, если валюта не найдена"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur, DB_QUERY_SECONDS.time(query='update_currency'):
+            cur.execute(
+                "UPDATE currencies SET rate = %s WHERE currency_name = %s",
+                (new_rate, currency_name)
+            )
+            if cur.rowcount == 0:
+                return False
+            notify_changed(cur, currency_name)
+    return True
+
+
+def delete_currency(currency_name):
+    """Удаление валюты. Возвращает False, если валюта не найдена"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur, DB_QUERY_SECONDS.time(query='delete_currency'):
+            cur.execute(
+                "DELETE FROM currencies WHERE currency_name = %s",
+                (currency_name,)
+            )
+            if cur.rowcount == 0:
+                return False
+            notify_changed(cur, currency_name)
+    return True
+
+
+def upsert_currencies(rows):
+    """Добавление/обновление многих валют в одной транзакции.
+
+    rows - список (currency_name, rate) без повторяющихся (без учета регистра)
+    имен. Существующая валюта ищется без учета регистра, ее имя не меняется.
+    Возвращает {имя в нижнем регистре: 'inserted' | 'updated'}.
+    """
+    if not rows:
+        return {}
+    with get_db_connection() as conn:
+        with conn.cursor() as cur, DB_QUERY_SECONDS.time(query='upsert_currencies'):
+            result = psycopg2.extras.execute_values(
+                cur,
+                "INSERT INTO currencies (currency_name, rate) VALUES %s "
+                "ON CONFLICT ((lower(currency_name))) DO UPDATE SET rate = EXCLUDED.rate "
+                "RETURNING currency_name, (xmax = 0) AS inserted",
+                rows,
+                page_size=1000,
+                fetch=True
+            )
+            notify_changed(cur)
+    return {name.lower(): 'inserted' if inserted else 'updated' for name, inserted in result}
+
+
+def delete_currencies(currency_names):
+    """Удаление многих валют одним запросом. Возвращает множество удаленных имен"""
+    if not currency_names:
+        return set()
+    with get_db_connection() as conn:
+        with conn.cursor() as cur, DB_QUERY_SECONDS.time(query='delete_currencies'):
+            cur.execute(
+                "DELETE FROM currencies WHERE currency_name = ANY(%s) RETURNING currency_name",
+                (list(currency_names),)
+            )
+            deleted = {row[0] for row in cur.fetchall()}
+            if deleted:
+                notify_changed(cur)
+    return deleted
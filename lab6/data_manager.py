@@ -1,23 +1,49 @@
-from flask import Flask, request, jsonify
-import psycopg2
 import os
-from dotenv import load_dotenv
+import json
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN, localcontext
+from flask import Flask, Response, request, jsonify, stream_with_context
+import currency_repository
 
-load_dotenv()
+from common.metrics import CallbackMetric, instrument_flask
+from rate_cache import RateCache
 
 app = Flask(__name__)
+instrument_flask(app)
 
-DB_CONFIG = {
-    'host': os.environ['DB_HOST'],
-    'port': os.environ['DB_PORT'],
-    'user': os.environ['DB_USER'],
-    'password': os.environ['DB_PASSWORD'],
-    'database': os.environ['DB_NAME']
-}
+# Кэш курсов: сбрасывается по уведомлениям от currency_manager, TTL - страховка
+RATE_CACHE_TTL = float(os.getenv('RATE_CACHE_TTL', 60))
+rate_cache = RateCache(
+    currency_repository.get_rate, ttl=RATE_CACHE_TTL, bulk_loader=currency_repository.get_rates
+)
+rate_cache.start_listener(currency_repository.DB_CONFIG, currency_repository.NOTIFY_CHANNEL)
 
+# Метрики пула соединений и кэша читаются из их счетчиков при запросе /metrics
+CallbackMetric(
+    'db_pool_connections_in_use', 'Занятые соединения пула БД',
+    lambda: currency_repository.pool_stats()['in_use']
+)
+CallbackMetric(
+    'db_pool_timeouts_total', 'Ожидания соединения, завершившиеся по таймауту',
+    lambda: currency_repository.pool_stats()['timeouts_total'], kind='counter'
+)
 
-def get_db_connection():
-    return psycopg2.connect(**DB_CONFIG)
+
+def rate_cache_lookups():
+    stats = rate_cache.stats()
+    return {('hit',): stats['hits'], ('miss',): stats['misses']}
+
+
+CallbackMetric(
+    'rate_cache_lookups_total', 'Обращения к кэшу курсов', rate_cache_lookups,
+    labelnames=('result',), kind='counter'
+)
+
+# Ограничения пакетной конвертации
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 100000))
+BATCH_STREAM_CHUNK = 500
+CENT = Decimal('0.01')
+# Предел знаков в целой и в дробной части суммы
+AMOUNT_MAX_DIGITS = 30
 
 
 @app.route('/convert', methods=['GET'])
@@ -34,48 +60,180 @@ def convert_currency():
         return jsonify({'error': 'Amount должен быть числом'}), 400
 
     try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                # Получаем курс валюты
-                cur.execute(
-                    "SELECT rate FROM currencies WHERE currency_name = %s",
-                    (currency_name,)
-                )
-                result = cur.fetchone()
+        # Получаем курс валюты
+        rate = rate_cache.get(currency_name)
+        if rate is None:
+            return jsonify({'error': 'Валюта не найдена'}), 404
+        rate = float(rate)
+
+        converted_amount = round(amount * rate, 2)
+
+        return jsonify({
+            'original_amount': amount,
+            'currency': currency_name,
+            'rate': rate,
+            'converted_amount': converted_amount
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-                if not result:
-                    return jsonify({'error': 'Валюта не найдена'}), 404
 
-                rate = float(result[0])
-                converted_amount = round(amount * rate, 2)
+def parse_batch_item(item):
+    """(currency, Decimal amount) из {"currency": ..., "amount": ...} или [currency, amount]"""
+    if isinstance(item, dict):
+        currency_name, amount = item.get('currency'), item.get('amount')
+    elif isinstance(item, list) and len(item) == 2:
+        currency_name, amount = item
+    else:
+        raise ValueError('Элемент должен содержать currency и amount')
 
-                return jsonify({
-                    'original_amount': amount,
-                    'currency': currency_name,
-                    'rate': rate,
-                    'converted_amount': converted_amount
-                }), 200
+    if not isinstance(currency_name, str) or not currency_name:
+        raise ValueError('Необходимо указать currency')
+    if isinstance(amount, bool) or not isinstance(amount, (int, Decimal, str)):
+        raise ValueError('Amount должен быть числом')
+    try:
+        amount = Decimal(amount)
+    except InvalidOperation:
+        raise ValueError('Amount должен быть числом')
+    if not amount.is_finite():
+        raise ValueError('Amount должен быть числом')
+    if amount and amount.adjusted() >= AMOUNT_MAX_DIGITS:
+        raise ValueError(f'Amount должен быть меньше 10^{AMOUNT_MAX_DIGITS}')
+    if amount.as_tuple().exponent < -AMOUNT_MAX_DIGITS:
+        raise ValueError(f'Amount: не более {AMOUNT_MAX_DIGITS} знаков после запятой')
+    return currency_name, amount
+
+
+def convert_amount(amount, rate):
+    """amount * rate с округлением до копеек; точность контекста подбирается
+    под множители, чтобы ни умножение, ни quantize не теряли знаков"""
+    with localcontext() as ctx:
+        # Произведение точное: в нем не больше знаков, чем в обоих множителях
+        ctx.prec = len(amount.as_tuple().digits) + len(rate.as_tuple().digits)
+        product = amount * rate
+        ctx.prec = max(ctx.prec, product.adjusted() + 3)
+        return product.quantize(CENT, rounding=ROUND_HALF_EVEN)
+
+
+def decimal_to_json(value):
+    return format(value, 'f')
+
+
+@app.route('/convert/batch', methods=['POST'])
+def convert_currency_batch():
+    """Конвертация многих сумм за раз; ответ отдается потоком.
+
+    Все нужные курсы читаются одним запросом (или из кэша), суммы
+    считаются в Decimal с округлением до копеек так же, как round() в /convert.
+    """
+    try:
+        # parse_float=Decimal, чтобы суммы не проходили через float
+        data = json.loads(request.get_data(), parse_float=Decimal)
+    except ValueError:
+        return jsonify({'error': 'Некорректный JSON'}), 400
+
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return jsonify({'error': 'Необходимо передать список items'}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'error': f'Не более {BATCH_MAX_ITEMS} элементов за запрос'}), 400
+
+    parsed = []
+    for item in items:
+        try:
+            parsed.append(parse_batch_item(item))
+        except ValueError as e:
+            parsed.append(str(e))
+
+    try:
+        rates = rate_cache.get_many(p[0] for p in parsed if isinstance(p, tuple))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    def generate():
+        yield '{"results": ['
+        chunk = []
+        sent = 0
+        errors = 0
+        for index, entry in enumerate(parsed):
+            if isinstance(entry, str):
+                line = json.dumps({'index': index, 'error': entry}, ensure_ascii=False)
+                errors += 1
+            elif entry[0] not in rates:
+                line = json.dumps(
+                    {'index': index, 'currency': entry[0], 'error': 'Валюта не найдена'},
+                    ensure_ascii=False
+                )
+                errors += 1
+            else:
+                currency_name, amount = entry
+                # Курс в кэше - Decimal из NUMERIC, без прохода через float
+                rate = rates[currency_name]
+                try:
+                    converted_amount = convert_amount(amount, rate)
+                except InvalidOperation:
+                    line = json.dumps(
+                        {'index': index, 'currency': currency_name, 'error': 'Сумма вне допустимого диапазона'},
+                        ensure_ascii=False
+                    )
+                    errors += 1
+                else:
+                    line = (
+                        f'{{"index": {index}, "currency": {json.dumps(currency_name, ensure_ascii=False)}, '
+                        f'"original_amount": {decimal_to_json(amount)}, "rate": {decimal_to_json(rate)}, '
+                        f'"converted_amount": {decimal_to_json(converted_amount)}}}'
+                    )
+            chunk.append(line)
+            if len(chunk) >= BATCH_STREAM_CHUNK:
+                yield (',' if sent else '') + ','.join(chunk)
+                sent += len(chunk)
+                chunk = []
+        if chunk:
+            yield (',' if sent else '') + ','.join(chunk)
+        yield f'], "count": {len(parsed)}, "errors": {errors}}}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
 
 @app.route('/currencies', methods=['GET'])
 def get_all_currencies():
     try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT currency_name, rate FROM currencies")
-                currencies = cur.fetchall()
+        result = [{
+            'currency_name': currency_name,
+            'rate': rate
+        } for currency_name, rate in currency_repository.get_all_currencies()]
 
-                result = [{
-                    'currency_name': currency[0],
-                    'rate': float(currency[1])
-                } for currency in currencies]
+        return jsonify({'currencies': result}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/currencies/lookup', methods=['GET'])
+def lookup_currency():
+    """Проверка существования валюты без учета регистра (по индексу lower(currency_name))"""
+    currency_name = request.args.get('currency')
+    if not currency_name:
+        return jsonify({'error': 'Необходимо указать currency'}), 400
 
-                return jsonify({'currencies': result}), 200
+    try:
+        result = currency_repository.find_currency(currency_name)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    if not result:
+        return jsonify({'error': 'Валюта не найдена'}), 404
+    return jsonify({'currency_name': result[0], 'rate': result[1]}), 200
+
+
+@app.route('/pool_stats', methods=['GET'])
+def get_pool_stats():
+    return jsonify(currency_repository.pool_stats()), 200
+
+
+@app.route('/cache_stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(rate_cache.stats()), 200
+
 
 if __name__ == '__main__':
     app.run(port=5002, debug=True)
\ No newline at end of file
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import random
+import time
+
+import aiohttp
+
+from common.metrics import UPSTREAM_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceError(Exception):
+    pass
+
+
+class CircuitOpenError(ServiceError):
+    pass
+
+
+class ServiceUnavailableError(ServiceError):
+    pass
+
+
+class CircuitBreaker:
+    """После failure_threshold ошибок подряд запросы не отправляются
+    reset_timeout секунд, затем пропускается один пробный запрос."""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_progress = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow_request(self):
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half_open' and not self.trial_in_progress:
+            self.trial_in_progress = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_progress = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_progress = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+def create_session(limit=100, limit_per_host=20, keepalive_timeout=30):
+    """Общая сессия с пулом keep-alive соединений для всех сервисов"""
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=limit, limit_per_host=limit_per_host, keepalive_timeout=keepalive_timeout
+        )
+    )
+
+
+class ServiceClient:
+    """Асинхронный клиент одного HTTP-сервиса: таймауты, повторы, предохранитель.
+
+    GET повторяется при любых сетевых ошибках и ответах 5xx, остальные
+    методы - только если соединение не удалось установить (запрос не ушел).
+    Время каждой попытки пишется в upstream_request_duration_seconds с меткой name.
+    """
+
+    def __init__(self, base_url, timeout=5, retries=2, backoff=0.2,
+                 failure_threshold=5, reset_timeout=30, name=None):
+        self.base_url = base_url
+        self.name = name or base_url
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.session = None
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request('POST', path, **kwargs)
+
+    async def request(self, method, path, params=None, json=None):
+        """Возвращает (код ответа, тело JSON или None)"""
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"Сервис {self.base_url} временно отключен")
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            status = 'error'
+            try:
+                async with self.session.request(
+                        method, f"{self.base_url}{path}",
+                        params=params, json=json, timeout=self.timeout
+                ) as response:
+                    status = response.status
+                    try:
+                        data = await response.json(content_type=None)
+                    except ValueError:
+                        data = None
+                    if response.status < 500:
+                        self.breaker.record_success()
+                        return response.status, data
+                    error = f"код ответа {response.status}"
+                    can_retry = method == 'GET'
+            except aiohttp.ClientConnectorError as e:
+                error = str(e)
+                can_retry = True
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+                can_retry = method == 'GET'
+            except asyncio.CancelledError:
+                # Отмененный пробный запрос не должен держать предохранитель
+                self.breaker.trial_in_progress = False
+                raise
+            finally:
+                UPSTREAM_REQUEST_SECONDS.observe(
+                    time.perf_counter() - started, service=self.name, status=status
+                )
+
+            if not can_retry or attempt >= self.retries:
+                self.breaker.record_failure()
+                logger.error(f"Ошибка запроса {method} {self.base_url}{path}: {error}")
+                raise ServiceUnavailableError(error)
+
+            # Экспоненциальная задержка со случайным разбросом
+            delay = self.backoff * 2 ** attempt
+            await asyncio.sleep(delay + random.uniform(0, delay))
+            attempt += 1
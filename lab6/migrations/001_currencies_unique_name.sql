@@ -0,0 +1,2 @@
+-- Уникальность имени валюты (ограничение для вставки с точным именем)
+CREATE UNIQUE INDEX IF NOT EXISTS currencies_currency_name_key ON currencies (currency_name);
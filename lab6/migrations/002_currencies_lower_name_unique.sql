@@ -0,0 +1,4 @@
+-- Имена валют уникальны без учета регистра; индекс используется поиском
+-- WHERE lower(currency_name) = lower(...). Перед применением нужно убрать
+-- валюты, различающиеся только регистром.
+CREATE UNIQUE INDEX IF NOT EXISTS currencies_lower_name_key ON currencies (lower(currency_name));
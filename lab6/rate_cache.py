@@ -0,0 +1,141 @@
+import logging
+import select
+import threading
+import time
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+# Как часто поток-слушатель просыпается без уведомлений и пауза перед переподключением
+LISTEN_POLL_INTERVAL = 5
+LISTEN_RECONNECT_DELAY = 3
+
+
+class RateCache:
+    """Кэш курсов в памяти процесса со сквозным чтением из БД.
+
+    Записи живут не дольше ttl секунд и сбрасываются раньше по уведомлениям
+    LISTEN/NOTIFY, которые currency_manager отправляет при каждом изменении.
+    """
+
+    def __init__(self, loader, ttl, bulk_loader=None):
+        self._loader = loader
+        self._bulk_loader = bulk_loader
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Увеличивается при каждом сбросе, чтобы не сохранить курс,
+        # прочитанный из БД до пришедшего во время чтения уведомления
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self.listening = False
+
+    def get(self, currency_name):
+        """Курс валюты или None, если валюта не найдена"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(currency_name)
+            if entry and entry[1] > now:
+                self._hits += 1
+                return entry[0]
+            self._misses += 1
+            generation = self._generation
+
+        rate = self._loader(currency_name)
+        if rate is not None:
+            self.put(currency_name, rate, generation)
+        return rate
+
+    def get_many(self, currency_names):
+        """Курсы нескольких валют; все промахи читаются из БД одним запросом.
+
+        Возвращает словарь только с найденными валютами.
+        """
+        now = time.monotonic()
+        found = {}
+        missing = []
+        with self._lock:
+            for currency_name in set(currency_names):
+                entry = self._entries.get(currency_name)
+                if entry and entry[1] > now:
+                    self._hits += 1
+                    found[currency_name] = entry[0]
+                else:
+                    self._misses += 1
+                    missing.append(currency_name)
+            generation = self._generation
+
+        if missing:
+            for currency_name, rate in self._bulk_loader(missing).items():
+                self.put(currency_name, rate, generation)
+                found[currency_name] = rate
+        return found
+
+    def put(self, currency_name, rate, generation=None):
+        with self._lock:
+            if generation is None or generation == self._generation:
+                self._entries[currency_name] = (rate, time.monotonic() + self.ttl)
+
+    def invalidate(self, currency_name=None):
+        """Сброс одной валюты или всего кэша (currency_name=None)"""
+        with self._lock:
+            self._generation += 1
+            self._invalidations += 1
+            if currency_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(currency_name, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / lookups, 3) if lookups else 0.0,
+                'invalidations': self._invalidations,
+                'listening': self.listening,
+            }
+
+    # ================== LISTEN/NOTIFY ==================
+
+    def start_listener(self, db_config, channel):
+        thread = threading.Thread(
+            target=self._listen, args=(db_config, channel),
+            name='rate-cache-listener', daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _listen(self, db_config, channel):
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(**db_config)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {channel}")
+                # Пока соединения не было, уведомления могли потеряться
+                self.invalidate()
+                self.listening = True
+                logger.info(f"Кэш курсов подписан на канал {channel}")
+
+                while True:
+                    if select.select([conn], [], [], LISTEN_POLL_INTERVAL) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self.invalidate(None if notify.payload == '*' else notify.payload)
+            except Exception as e:
+                self.listening = False
+                logger.error(f"Ошибка слушателя уведомлений кэша курсов: {str(e)}")
+                time.sleep(LISTEN_RECONNECT_DELAY)
+            finally:
+                if conn:
+                    conn.close()
@@ -0,0 +1,132 @@
+import io
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import unittest
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lab2'))
+import task_1
+from task_1 import Stats, collect_stats, iter_chunks, split_file, stream_stats
+
+# Маленькие блоки, чтобы числа разрезались границами блоков
+CHUNK_SIZES = [1, 3, 7, 64]
+
+
+def make_text(values):
+    rnd = random.Random(len(values))
+    separators = [' ', '\n', '  ', '\t', ' \n']
+    return ''.join(f'{x}{rnd.choice(separators)}' for x in values).encode()
+
+
+class TestStreamStats(unittest.TestCase):
+    def setUp(self):
+        rnd = random.Random(24)
+        self.ints = [rnd.randint(-10 ** 6, 10 ** 6) for _ in range(500)]
+        self.floats = [round(rnd.uniform(-1000, 1000), 3) for _ in range(500)]
+
+    def assertStats(self, stats, values, exact_total=True):
+        self.assertEqual(stats.count, len(values))
+        if exact_total:
+            self.assertEqual(stats.total, sum(values))
+        else:
+            self.assertTrue(math.isclose(stats.total, math.fsum(values), rel_tol=1e-9))
+        self.assertEqual(stats.min, min(values))
+        self.assertEqual(stats.max, max(values))
+        self.assertTrue(math.isclose(stats.mean, statistics.fmean(values), rel_tol=1e-9, abs_tol=1e-9))
+        self.assertTrue(math.isclose(stats.variance, statistics.pvariance(values), rel_tol=1e-9))
+
+    def test_chunks_do_not_split_numbers(self):
+        data = make_text(self.ints)
+        for chunk_size in CHUNK_SIZES:
+            tokens = [t for chunk in iter_chunks(io.BytesIO(data), chunk_size) for t in chunk.split()]
+            self.assertEqual(list(map(int, tokens)), self.ints)
+
+    def test_integers(self):
+        data = make_text(self.ints)
+        for chunk_size in CHUNK_SIZES:
+            self.assertStats(stream_stats(io.BytesIO(data), chunk_size=chunk_size), self.ints)
+
+    def test_floats(self):
+        data = make_text(self.floats)
+        for chunk_size in CHUNK_SIZES:
+            stats = stream_stats(io.BytesIO(data), chunk_size=chunk_size)
+            self.assertStats(stats, self.floats, exact_total=False)
+
+    def test_no_trailing_whitespace(self):
+        stats = stream_stats(io.BytesIO(b'12 345 6789'), chunk_size=2)
+        self.assertStats(stats, [12, 345, 6789])
+
+    def test_merge_matches_single_pass(self):
+        values = self.floats
+        stats = Stats()
+        for start in range(0, len(values), 37):
+            stats.merge(Stats.from_values(values[start:start + 37]))
+        self.assertStats(stats, values, exact_total=False)
+
+    def test_huge_integers(self):
+        values = [10 ** 400, 1, -(10 ** 399)]
+        stats = stream_stats(io.BytesIO(make_text(values)), chunk_size=5)
+        self.assertEqual(stats.total, sum(values))
+        self.assertEqual(stats.max, 10 ** 400)
+        self.assertIsNone(stats.variance)
+        self.assertEqual(stats.exact_mean, Decimal(sum(values)) / 3)
+
+    def test_not_a_number(self):
+        with self.assertRaises(ValueError):
+            stream_stats(io.BytesIO(b'1 2 x3 4'), chunk_size=3)
+
+    def test_empty(self):
+        stats = stream_stats(io.BytesIO(b'  \n'))
+        self.assertEqual(stats.count, 0)
+        self.assertIsNone(stats.variance)
+
+    @unittest.skipIf(task_1.np is None, 'NumPy не установлен')
+    def test_numpy(self):
+        for values in (self.ints, self.floats):
+            data = make_text(values)
+            for chunk_size in CHUNK_SIZES:
+                stats = stream_stats(io.BytesIO(data), use_numpy=True, chunk_size=chunk_size)
+                self.assertStats(stats, values, exact_total=False)
+
+
+class TestParallelStats(unittest.TestCase):
+    def setUp(self):
+        rnd = random.Random(25)
+        self.values = [rnd.randint(-99999, 99999) for _ in range(2000)]
+        fd, self.path = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(make_text(self.values))
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_split_file_bounds(self):
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        for parts in (1, 2, 3, 7):
+            tokens = []
+            for start, end in split_file(self.path, parts):
+                tokens.extend(data[start:end].split())
+            self.assertEqual(list(map(int, tokens)), self.values)
+
+    def test_workers(self):
+        for workers in (2, 3):
+            stats = collect_stats([self.path], workers=workers, chunk_size=11)
+            self.assertEqual(stats.count, len(self.values))
+            self.assertEqual(stats.total, sum(self.values))
+            self.assertEqual((stats.min, stats.max), (min(self.values), max(self.values)))
+            self.assertTrue(math.isclose(stats.variance, statistics.pvariance(self.values), rel_tol=1e-9))
+
+    @unittest.skipIf(task_1.np is None, 'NumPy не установлен')
+    def test_workers_numpy(self):
+        stats = collect_stats([self.path], workers=2, use_numpy=True, chunk_size=11)
+        self.assertEqual(stats.count, len(self.values))
+        self.assertTrue(math.isclose(stats.variance, statistics.pvariance(self.values), rel_tol=1e-9))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import io
+import os
+import random
+import sys
+import tempfile
+import unittest
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lab2'))
+import task_3
+from task_3 import ArrayScan, NumpyArrayScan, scan_input, write_numbers
+
+# Маленькие блоки, чтобы числа разрезались границами блоков
+CHUNK_SIZES = [1, 5, 16, 64]
+
+
+class TestArrayScan(unittest.TestCase):
+    def setUp(self):
+        rnd = random.Random(25)
+        self.values = [rnd.randint(-10 ** 9, 10 ** 9) for _ in range(1000)]
+        # Повтор максимума: должен остаться индекс первого вхождения
+        self.values[700] = self.values[300] = 10 ** 9 + 7
+        self.odd = sorted((x for x in self.values if x % 2 != 0), reverse=True)
+        self.files = []
+
+    def tearDown(self):
+        for path in self.files:
+            os.remove(path)
+
+    def write_file(self, data, suffix):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        self.files.append(path)
+        return path
+
+    def assertScan(self, scan, values, top=None):
+        odd = sorted((x for x in values if x % 2 != 0), reverse=True)
+        self.assertEqual(scan.count, len(values))
+        self.assertEqual(scan.odd_count, len(odd))
+        self.assertEqual(scan.max_val, max(values))
+        self.assertEqual(scan.max_index, values.index(max(values)))
+        self.assertEqual(list(scan.sorted_odd()), odd if top is None else odd[:top])
+
+    def test_blocks(self):
+        for size in (1, 7, 100, len(self.values)):
+            scan = ArrayScan()
+            for start in range(0, len(self.values), size):
+                scan.feed(array('q', self.values[start:start + size]))
+            self.assertScan(scan, self.values)
+
+    def test_top(self):
+        for top in (1, 10, len(self.odd) + 5):
+            scan = ArrayScan(top)
+            for start in range(0, len(self.values), 33):
+                scan.feed(self.values[start:start + 33])
+            self.assertScan(scan, self.values, top)
+
+    def test_big_integers_from_argv(self):
+        values = [3, 10 ** 30 + 1, -(10 ** 25) - 1, 10 ** 30 + 1, 8]
+        scan = ArrayScan(compact=False)
+        scan.feed(values)
+        self.assertScan(scan, values)
+
+    def test_text_file(self):
+        text = ''.join(f'{x}{" " if i % 3 else chr(10)}' for i, x in enumerate(self.values))
+        path = self.write_file(text.encode(), '.txt')
+        for chunk_size in CHUNK_SIZES:
+            self.assertScan(scan_input(path, chunk_size=chunk_size), self.values)
+        self.assertScan(scan_input(path, top=5, chunk_size=5), self.values, 5)
+
+    def test_binary_file(self):
+        path = self.write_file(array('q', self.values).tobytes(), '.bin')
+        for chunk_size in CHUNK_SIZES:
+            self.assertScan(scan_input(path, binary=True, chunk_size=chunk_size), self.values)
+
+    def test_binary_bad_size(self):
+        path = self.write_file(array('q', [1, 2]).tobytes() + b'\0', '.bin')
+        with self.assertRaises(ValueError):
+            scan_input(path, binary=True, chunk_size=8)
+
+    def test_write_numbers(self):
+        out = io.StringIO()
+        write_numbers('Нечетные:', iter(self.odd), out)
+        self.assertEqual(out.getvalue(), 'Нечетные: ' + ' '.join(map(str, self.odd)) + '\n')
+
+    @unittest.skipIf(task_3.np is None, 'NumPy не установлен')
+    def test_numpy(self):
+        text = ' '.join(map(str, self.values)).encode()
+        text_path = self.write_file(text, '.txt')
+        binary_path = self.write_file(array('q', self.values).tobytes(), '.bin')
+        for chunk_size in CHUNK_SIZES:
+            self.assertScan(scan_input(text_path, use_numpy=True, chunk_size=chunk_size), self.values)
+            self.assertScan(
+                scan_input(binary_path, binary=True, use_numpy=True, chunk_size=chunk_size), self.values
+            )
+        scan = NumpyArrayScan(10)
+        scan.feed(self.values)
+        self.assertScan(scan, self.values, 10)
+
+
+if __name__ == '__main__':
+    unittest.main()